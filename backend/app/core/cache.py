@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from redis.exceptions import RedisError
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache with a per-entry time to live and
+    hit/miss/eviction counters. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value. ``ttl`` overrides the cache-wide lifetime for this
+        entry, e.g. to expire it together with the data it was derived from.
+        """
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.monotonic() + lifetime, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class ResponseCache:
+    """
+    Read-through cache for rendered responses: an in-process LRU, optionally
+    backed by Redis so replicas share entries.
+
+    Entries are invalidated through generation counters rather than by
+    deleting keys. A key embeds the generations of the scopes it depends on
+    (see ``generations``), and a write bumps the scopes it touches, so later
+    lookups miss and old entries age out. Reading the generations before the
+    database also means a read racing a write can only store its result
+    under the old generation, where nobody looks any more.
+
+    With Redis, the generations live in one hash without a TTL, so every
+    replica sees the same ones and the local LRU stays coherent. Entries get
+    the cache TTL, so an eviction policy like ``volatile-lru`` drops entries
+    but never generations.
+    """
+
+    PREFIX = "appointment_cache:"
+    GENERATIONS = "appointment_cache:generations"
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        redis: Optional[Callable[[], Any]] = None,
+    ):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        # Called on first use, like get_redis, so importing stays offline
+        self.redis = redis
+        self._generations: dict[str, int] = {}
+        self.shared_hits = 0
+        self.errors = 0
+
+    async def generations(self, *scopes: str) -> Optional[tuple[int, ...]]:
+        """Current generation of each scope, or None if Redis is unreachable."""
+        if self.redis is None:
+            return tuple(self._generations.get(scope, 0) for scope in scopes)
+        try:
+            values = await self.redis().hmget(self.GENERATIONS, scopes)
+        except RedisError as e:
+            self._failed("read", e)
+            return None
+        return tuple(int(value or 0) for value in values)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None or self.redis is None:
+            return value
+        try:
+            raw = await self.redis().get(self.PREFIX + key)
+        except RedisError as e:
+            self._failed("read", e)
+            return None
+        if raw is None:
+            return None
+        # Counted as a local miss above; remember it here as a shared hit
+        self.shared_hits += 1
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        if self.redis is None:
+            return
+        try:
+            await self.redis().set(
+                self.PREFIX + key, json.dumps(value), ex=max(1, int(self.ttl))
+            )
+        except RedisError as e:
+            self._failed("write", e)
+
+    async def invalidate(self, *scopes: str) -> None:
+        if self.redis is None:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+            return
+        try:
+            async with self.redis().pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    pipe.hincrby(self.GENERATIONS, scope, 1)
+                await pipe.execute()
+        except RedisError as e:
+            # Other replicas keep serving their entries until the TTL runs out
+            self.local.clear()
+            self._failed("invalidate", e)
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        print(f"Response cache {action} failed: {error}")
+
+    def clear(self) -> None:
+        self.local.clear()
+        self._generations.clear()
+        self.shared_hits = self.errors = 0
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "backend": "memory" if self.redis is None else "memory+redis",
+            "shared_hits": self.shared_hits,
+            "errors": self.errors,
+        }
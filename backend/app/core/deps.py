@@ -1,37 +1,123 @@
+import hashlib
+import os
+import time
+
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlmodel import Session, select
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from backend.app.core.security import ALGORITHM, SECRET_KEY
-from backend.app.database import get_session
-from backend.app.models import User
+from backend.app.core.cache import TTLCache
+from backend.app.core.security import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    SECRET_KEY,
+)
+from backend.app.database import get_async_read_session
+from backend.app.models import User, UserRead
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Authenticated principals by username. Entries are dropped whenever a user
+# row is written in this process, and again when that write commits; the
+# TTL bounds staleness for changes made elsewhere (another replica, a manual
+# SQL edit).
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Claims of tokens whose signature was already verified, keyed by a digest of
+# the token so raw bearer tokens are not kept in memory. Each entry expires
+# together with the token's own "exp".
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def invalidate_user(username: str) -> None:
+    user_cache.pop(username)
+
+
+# Usernames written in a session's current transaction
+_WRITTEN_USERS = "written_users"
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_row(_mapper, _connection, target: User) -> None:
+    invalidate_user(target.username)
+    # Flushed, not committed: a read in between still sees the old row and
+    # may cache it again, so the entry is dropped once more after commit
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_WRITTEN_USERS, set()).add(target.username)
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
-):
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for username in session.info.pop(_WRITTEN_USERS, ()):
+        invalidate_user(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    session.info.pop(_WRITTEN_USERS, None)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Return the claims of a valid token, raising JWTError otherwise. Repeat
+    calls with the same token skip signature verification.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    expires_at = claims.get("exp")
+    remaining = expires_at - time.time() if expires_at is not None else None
+    if remaining is None or remaining > 0:
+        token_cache.set(key, claims, ttl=remaining)
+    return claims
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_read_session),
+) -> UserRead:
     credentials_exception = HTTPException(
         status_code=401, detail="Could not validate credentials"
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = session.exec(select(User).where(User.username == username)).first()
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+
+    result = await session.exec(select(User).where(User.username == username))
+    user = result.first()
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = UserRead.model_validate(user, from_attributes=True)
+    user_cache.set(username, principal)
+    return principal
 
 
 def require_role(required_role: str):
-    def dependency(current_user: User = Depends(get_current_user)):
+    async def dependency(current_user: UserRead = Depends(get_current_user)):
         if current_user.role != required_role:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return current_user
@@ -2,25 +2,215 @@
 Database engine and session utilities for SQLite persistence.
 """
 
+import datetime as dt
+import os
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pathlib import Path
 
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 
 DATABASE_URL = "sqlite:///data/appointments.db"
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///data/appointments.db"
+
+# Connection profile, applied on every new connection. WAL lets readers
+# and the writer work concurrently; busy_timeout makes a blocked writer
+# wait instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Negative values are KiB: 64 MiB page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+# SQLite has a single writer, so writes queue on the pool rather than
+# racing for the file lock. Reads get their own, larger pool.
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "1"))
+DB_WRITE_MAX_OVERFLOW = int(os.getenv("DB_WRITE_MAX_OVERFLOW", "0"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def _pragma_listener(read_only: bool):
+    def apply_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            # The journal mode is persistent and can only be set by a writer
+            if read_only and name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return apply_pragmas
+
+
+def _pool_options(read_only: bool) -> dict:
+    if read_only:
+        return {"pool_size": DB_READ_POOL_SIZE, "max_overflow": DB_READ_MAX_OVERFLOW}
+    return {"pool_size": DB_WRITE_POOL_SIZE, "max_overflow": DB_WRITE_MAX_OVERFLOW}
+
+
+def create_sqlite_engine(url: str, read_only: bool = False) -> Engine:
+    sqlite_engine = create_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_timeout=DB_POOL_TIMEOUT,
+        **_pool_options(read_only),
+    )
+    event.listen(sqlite_engine, "connect", _pragma_listener(read_only))
+    return sqlite_engine
+
+
+def create_async_sqlite_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    sqlite_engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_timeout=DB_POOL_TIMEOUT,
+        **_pool_options(read_only),
+    )
+    event.listen(sqlite_engine.sync_engine, "connect", _pragma_listener(read_only))
+    return sqlite_engine
+
+
+engine = create_sqlite_engine(DATABASE_URL)
+
+# Used by the API routes so waiting on SQLite does not hold a threadpool thread
+async_engine = create_async_sqlite_engine(ASYNC_DATABASE_URL)
+async_read_engine = create_async_sqlite_engine(ASYNC_DATABASE_URL, read_only=True)
+
+# Bumped whenever init_db gains a data migration; kept in PRAGMA user_version
+SCHEMA_VERSION = 1
 
-engine = create_engine(
-    DATABASE_URL, echo=False, connect_args={"check_same_thread": False}
-)
+# Legacy rows whose slot cannot be parsed are moved here for manual repair
+UNPARSED_APPOINTMENTS_TABLE = "appointment_unparsed"
+
+# Formats accepted for rows written before date/time became typed columns
+LEGACY_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d.%m.%Y")
+LEGACY_TIME_FORMATS = ("%H:%M:%S.%f", "%H:%M:%S", "%H:%M")
 
 
 def init_db():
     from backend.app import models  # noqa: F401
 
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # Data migrations read every row, so run them once per database
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+        if version < 1:
+            migrate_appointment_slots(connection)
+        if version < SCHEMA_VERSION:
+            connection.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    # Objects stay loaded after commit; lazy loading is not possible in async
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def _parse_legacy(value: str, formats: tuple) -> Optional[dt.datetime]:
+    for fmt in formats:
+        try:
+            return dt.datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _move_unparsed(connection: Connection, ids: list[int]) -> None:
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {UNPARSED_APPOINTMENTS_TABLE} "
+            "(id INTEGER PRIMARY KEY, client_name VARCHAR, date VARCHAR, "
+            "time VARCHAR, notes VARCHAR)"
+        )
+    )
+    for appointment_id in ids:
+        params = {"id": appointment_id}
+        connection.execute(
+            text(
+                f"INSERT OR REPLACE INTO {UNPARSED_APPOINTMENTS_TABLE} "
+                "SELECT id, client_name, date, time, notes FROM appointment "
+                "WHERE id = :id"
+            ),
+            params,
+        )
+        connection.execute(text("DELETE FROM appointment WHERE id = :id"), params)
+    print(
+        f"Migration: moved {len(ids)} appointments with unparseable slots "
+        f"to {UNPARSED_APPOINTMENTS_TABLE}: {ids}"
+    )
+
+
+def migrate_appointment_slots(connection: Connection) -> None:
+    """
+    Upgrade appointment tables created when date and time were free-form
+    strings: rewrite values into SQLite's canonical sortable format and
+    create the unique (date, time) slot index. Rows whose slot cannot be
+    parsed would break every typed read, so they are moved to
+    ``appointment_unparsed``. Safe to run repeatedly.
+    """
+    rows = connection.execute(text("SELECT id, date, time FROM appointment")).all()
+    unparsed = []
+    for appointment_id, raw_date, raw_time in rows:
+        parsed_date = _parse_legacy(str(raw_date), LEGACY_DATE_FORMATS)
+        parsed_time = _parse_legacy(str(raw_time), LEGACY_TIME_FORMATS)
+        if parsed_date is None or parsed_time is None:
+            unparsed.append(appointment_id)
+            continue
+
+        date_value = parsed_date.strftime("%Y-%m-%d")
+        time_value = parsed_time.strftime("%H:%M:%S.%f")
+        if (date_value, time_value) != (raw_date, raw_time):
+            connection.execute(
+                text("UPDATE appointment SET date = :d, time = :t WHERE id = :id"),
+                {"d": date_value, "t": time_value, "id": appointment_id},
+            )
+
+    if unparsed:
+        _move_unparsed(connection, unparsed)
+
+    try:
+        with connection.begin_nested():
+            connection.execute(
+                text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_appointment_slot "
+                    "ON appointment (date, time)"
+                )
+            )
+    except IntegrityError:
+        # Legacy data already holds double bookings; keep the lookup index
+        # so queries stay fast, but leave the duplicates for manual cleanup.
+        print("Migration: duplicate appointment slots found, index is not unique")
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_appointment_slot "
+                "ON appointment (date, time)"
+            )
+        )
@@ -3,13 +3,27 @@ Main FastAPI application entrypoint.
 Includes routers and defines the root endpoint.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from backend.app.core.deps import require_role, token_cache, user_cache
+from backend.app.core.redis_client import close_redis
+from backend.app.core.security import shutdown_password_hashing
 from backend.app.database import init_db
-from backend.app.routes.appointments import router
+from backend.app.routes.appointments import appointment_cache, router
 from backend.app.routes.auth import router as auth_router
 from backend.app.routes.summary import router as summary_router
 
-app = FastAPI(title="Appointment Manager")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    yield
+    shutdown_password_hashing()
+    await close_redis()
+
+
+app = FastAPI(title="Appointment Manager", lifespan=lifespan)
 
 # Attach routers
 app.include_router(router)
@@ -23,6 +37,11 @@ def root():
     return {"status": "ok", "message": "Appointments API is running"}
 
 
-@app.on_event("startup")
-def on_startup():
-    init_db()
+# In-process cache statistics (per API process)
+@app.get("/metrics", dependencies=[Depends(require_role("admin"))])
+def metrics():
+    return {
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "appointment_cache": appointment_cache.stats(),
+    }
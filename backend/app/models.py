@@ -3,21 +3,50 @@ Pydantic + SQLModel models used for request validation,
 database storage, and API responses.
 """
 
+import datetime as dt
 from typing import Optional
 from pydantic import BaseModel
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class Appointment(SQLModel, table=True):
     """
     Database model for stored appointments.
+    Date and time are stored in SQLite's sortable ISO text format and
+    the (date, time) slot is unique, so conflict checks and date range
+    queries are index lookups.
     """
 
+    __table_args__ = (Index("ix_appointment_slot", "date", "time", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     client_name: str
-    date: str
-    time: str
+    date: dt.date
+    time: dt.time
+    notes: Optional[str] = None
+
+
+class AppointmentChange(SQLModel, table=True):
+    """
+    Append-only log of appointment writes, one row per created, updated or
+    deleted appointment, written in the same transaction as the change.
+    ``seq`` only ever grows, so "everything after seq N" is a range scan.
+    The row's values are those after the change (before it, for deletes).
+    """
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    appointment_id: int = Field(index=True)
+    op: str
+    client_name: str
+    date: dt.date
+    time: dt.time
     notes: Optional[str] = None
+    changed_at: dt.datetime = Field(
+        default_factory=lambda: dt.datetime.now(dt.timezone.utc)
+    )
 
 
 class AppointmentCreate(SQLModel):
@@ -26,8 +55,8 @@ class AppointmentCreate(SQLModel):
     """
 
     client_name: str
-    date: str
-    time: str
+    date: dt.date
+    time: dt.time
     notes: Optional[str] = None
 
 
@@ -38,8 +67,8 @@ class AppointmentRead(SQLModel):
 
     id: int
     client_name: str
-    date: str
-    time: str
+    date: dt.date
+    time: dt.time
     notes: Optional[str] = None
 
 
@@ -50,11 +79,77 @@ class AppointmentUpdate(SQLModel):
     """
 
     client_name: Optional[str] = None
-    date: Optional[str] = None
-    time: Optional[str] = None
+    date: Optional[dt.date] = None
+    time: Optional[dt.time] = None
+    notes: Optional[str] = None
+
+
+class BulkImportRow(BaseModel):
+    """
+    Outcome of one row of a bulk import.
+    status is one of "created", "conflict" or "invalid".
+    """
+
+    row: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    conflicts: int
+    invalid: int
+    results: list[BulkImportRow]
+
+
+class AppointmentChangeRead(SQLModel):
+    """
+    One change log entry. op is "created", "updated" or "deleted".
+    """
+
+    seq: int
+    appointment_id: int
+    op: str
+    client_name: str
+    date: dt.date
+    time: dt.time
     notes: Optional[str] = None
 
 
+class AppointmentChangePage(BaseModel):
+    """
+    Changes after a sequence number, oldest first. Ask again with the last
+    change's seq while has_more is set.
+    """
+
+    latest_seq: int
+    has_more: bool
+    changes: list[AppointmentChangeRead]
+
+
+class DayCount(BaseModel):
+    date: dt.date
+    count: int
+
+
+class ClientCount(BaseModel):
+    client_name: str
+    count: int
+
+
+class AppointmentStats(BaseModel):
+    """
+    Aggregates over the requested date range (all dates by default).
+    per_client lists the busiest clients first; today is not range-limited.
+    """
+
+    total: int
+    today: int
+    per_day: list[DayCount]
+    per_client: list[ClientCount]
+
+
 class User(SQLModel, table=True):
     """
     Database model for application users.
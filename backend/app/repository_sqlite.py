@@ -1,13 +1,204 @@
-from typing import Optional, List
+import datetime as dt
+from typing import AsyncIterator, Iterable, Iterator, Optional, List
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.app.models import (
     Appointment,
+    AppointmentChange,
     AppointmentCreate,
     AppointmentUpdate,
     AppointmentRead,
 )
 
+CHANGE_CREATED = "created"
+CHANGE_UPDATED = "updated"
+CHANGE_DELETED = "deleted"
+
+ROW_COLUMNS = (
+    Appointment.id,
+    Appointment.client_name,
+    Appointment.date,
+    Appointment.time,
+    Appointment.notes,
+)
+
+
+# Statement builders shared by the sync and async repositories
+
+
+def _list_statement(
+    limit: Optional[int],
+    after_id: Optional[int],
+    date_from: Optional[dt.date],
+    date_to: Optional[dt.date],
+    client_name: Optional[str],
+    after_slot: Optional[tuple[dt.date, dt.time, int]] = None,
+):
+    if date_from or date_to:
+        # Walk the (date, time) index through the range instead of sorting
+        # every matching row by id for each page. The id breaks ties between
+        # legacy double bookings, and the index already ends in the rowid.
+        key = tuple_(Appointment.date, Appointment.time, Appointment.id)
+        stmt = select(Appointment).order_by(
+            Appointment.date, Appointment.time, Appointment.id
+        )
+        if after_slot is not None:
+            stmt = stmt.where(key > after_slot)
+    else:
+        stmt = select(Appointment).order_by(Appointment.id)
+        if after_id is not None:
+            stmt = stmt.where(Appointment.id > after_id)
+    stmt = _date_filters(stmt, date_from, date_to)
+    if client_name:
+        stmt = stmt.where(
+            Appointment.client_name.contains(client_name, autoescape=True)
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _date_filters(stmt, date_from: Optional[dt.date], date_to: Optional[dt.date]):
+    if date_from:
+        stmt = stmt.where(Appointment.date >= date_from)
+    if date_to:
+        stmt = stmt.where(Appointment.date <= date_to)
+    return stmt
+
+
+def _rows_statement(
+    last_id: int,
+    date_from: Optional[dt.date],
+    date_to: Optional[dt.date],
+    max_id: Optional[int],
+    chunk_size: int,
+):
+    stmt = (
+        select(*ROW_COLUMNS)
+        .where(Appointment.id > last_id)
+        .order_by(Appointment.id)
+        .limit(chunk_size)
+    )
+    if max_id is not None:
+        stmt = stmt.where(Appointment.id <= max_id)
+    return _date_filters(stmt, date_from, date_to)
+
+
+def _snapshot_statement(date_from: Optional[dt.date], date_to: Optional[dt.date]):
+    stmt = select(func.count(Appointment.id), func.max(Appointment.id))
+    return _date_filters(stmt, date_from, date_to)
+
+
+def _day_count_statement(day: dt.date):
+    return select(func.count(Appointment.id)).where(Appointment.date == day)
+
+
+def _per_day_statement(date_from: Optional[dt.date], date_to: Optional[dt.date]):
+    stmt = (
+        select(Appointment.date, func.count(Appointment.id))
+        .group_by(Appointment.date)
+        .order_by(Appointment.date)
+    )
+    return _date_filters(stmt, date_from, date_to)
+
+
+def _per_client_statement(
+    date_from: Optional[dt.date], date_to: Optional[dt.date], limit: int
+):
+    count = func.count(Appointment.id)
+    stmt = (
+        select(Appointment.client_name, count)
+        .group_by(Appointment.client_name)
+        .order_by(count.desc(), Appointment.client_name)
+        .limit(limit)
+    )
+    return _date_filters(stmt, date_from, date_to)
+
+
+def _between_statement(start: dt.datetime, end: dt.datetime):
+    slot = tuple_(Appointment.date, Appointment.time)
+    return (
+        select(Appointment)
+        .where(slot >= (start.date(), start.time()))
+        .where(slot < (end.date(), end.time()))
+        .order_by(Appointment.date, Appointment.time)
+    )
+
+
+def _slot_statement(date: dt.date, time: dt.time):
+    return select(Appointment).where(Appointment.date == date, Appointment.time == time)
+
+
+def _taken_slots_statement(slots: List[tuple[dt.date, dt.time]]):
+    return select(Appointment.date, Appointment.time).where(
+        tuple_(Appointment.date, Appointment.time).in_(slots)
+    )
+
+
+def _create_many_statement():
+    return insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True)
+
+
+def _changes_statement(after_seq: int, until_seq: Optional[int], limit: Optional[int]):
+    stmt = (
+        select(AppointmentChange)
+        .where(AppointmentChange.seq > after_seq)
+        .order_by(AppointmentChange.seq)
+    )
+    if until_seq is not None:
+        stmt = stmt.where(AppointmentChange.seq <= until_seq)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _last_changes_statement(appointment_ids: List[int], before_seq: int):
+    last = (
+        select(func.max(AppointmentChange.seq))
+        .where(AppointmentChange.appointment_id.in_(appointment_ids))
+        .where(AppointmentChange.seq <= before_seq)
+        .group_by(AppointmentChange.appointment_id)
+    )
+    return select(AppointmentChange).where(AppointmentChange.seq.in_(last))
+
+
+def _latest_seq_statement(appointment_id: Optional[int] = None):
+    stmt = select(func.max(AppointmentChange.seq))
+    if appointment_id is not None:
+        stmt = stmt.where(AppointmentChange.appointment_id == appointment_id)
+    return stmt
+
+
+# Change log rows are added to the session next to the write they record,
+# so both are committed (or rolled back) together
+
+
+def _change(op: str, appointment: Appointment) -> AppointmentChange:
+    return AppointmentChange(
+        op=op,
+        appointment_id=appointment.id,
+        client_name=appointment.client_name,
+        date=appointment.date,
+        time=appointment.time,
+        notes=appointment.notes,
+    )
+
+
+def _created_changes(items: List[AppointmentCreate], ids: List[int]):
+    changed_at = dt.datetime.now(dt.timezone.utc)
+    return insert(AppointmentChange), [
+        {
+            **item.model_dump(),
+            "appointment_id": appointment_id,
+            "op": CHANGE_CREATED,
+            "changed_at": changed_at,
+        }
+        for item, appointment_id in zip(items, ids)
+    ]
+
 
 class SQLiteAppointmentRepository:
     """
@@ -17,8 +208,29 @@ class SQLiteAppointmentRepository:
     def __init__(self, session: Session):
         self.session = session
 
-    def list(self) -> List[AppointmentRead]:
-        result = self.session.exec(select(Appointment)).all()
+    def list(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        client_name: Optional[str] = None,
+        after_slot: Optional[tuple[dt.date, dt.time, int]] = None,
+    ) -> List[AppointmentRead]:
+        """
+        Return appointments ordered by id, or by slot when a date range is
+        given.
+
+        Pagination is keyset based: pass the id of the last row of the
+        previous page as ``after_id``, or its ``(date, time, id)`` as
+        ``after_slot`` for a date range. Filters are applied in SQL so the
+        cost of a call depends on ``limit``, not on the size of the table.
+        """
+        stmt = _list_statement(
+            limit, after_id, date_from, date_to, client_name, after_slot
+        )
+        result = self.session.exec(stmt).all()
         return [AppointmentRead.model_validate(a) for a in result]
 
     def get(self, appointment_id: int) -> Optional[AppointmentRead]:
@@ -27,19 +239,170 @@ class SQLiteAppointmentRepository:
             return AppointmentRead.model_validate(appointment)
         return None
 
-    def find_by_datetime(self, date: str, time: str) -> Optional[AppointmentRead]:
-        stmt = select(Appointment).where(
-            Appointment.date == date, Appointment.time == time
-        )
-        appointment = self.session.exec(stmt).first()
+    def iter_rows(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        max_id: Optional[int] = None,
+        chunk_size: int = 1000,
+        one_transaction: bool = False,
+    ) -> Iterator[List[tuple]]:
+        """
+        Yield raw ``(id, client_name, date, time, notes)`` tuples in chunks.
+
+        Each chunk is a separate keyset query and a short read transaction,
+        and plain tuples are never added to the session's identity map, so
+        memory stays flat regardless of table size. ``max_id`` pins the
+        iteration to rows that existed when a snapshot was taken.
+
+        With ``one_transaction`` all chunks are read in the session's current
+        transaction instead, so they and any earlier read on the session,
+        such as ``latest_seq``, see one state of the database. Under WAL
+        this does not block writers.
+        """
+        last_id = 0
+        while True:
+            stmt = _rows_statement(last_id, date_from, date_to, max_id, chunk_size)
+            rows = [tuple(row) for row in self.session.exec(stmt).all()]
+            # Release the connection back to the pool between chunks
+            if not one_transaction:
+                self.session.rollback()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def snapshot(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+    ) -> tuple[int, int]:
+        """
+        Return ``(count, max_id)`` of the matching appointments with one
+        aggregate query; ``max_id`` is 0 when nothing matches.
+        """
+        count, max_id = self.session.exec(_snapshot_statement(date_from, date_to)).one()
+        return count, max_id or 0
+
+    def count_on(self, day: dt.date) -> int:
+        return self.session.exec(_day_count_statement(day)).one()
+
+    def count_by_day(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+    ) -> List[tuple[dt.date, int]]:
+        """``(date, count)`` for every date with appointments, in date order."""
+        stmt = _per_day_statement(date_from, date_to)
+        return [tuple(row) for row in self.session.exec(stmt).all()]
+
+    def count_by_client(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        limit: int = 10,
+    ) -> List[tuple[str, int]]:
+        """``(client_name, count)`` of the ``limit`` busiest clients."""
+        stmt = _per_client_statement(date_from, date_to, limit)
+        return [tuple(row) for row in self.session.exec(stmt).all()]
+
+    def list_between(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> List[AppointmentRead]:
+        """
+        Return appointments whose slot falls in ``[start, end)``, in
+        chronological order. Served by the (date, time) index.
+        """
+        result = self.session.exec(_between_statement(start, end)).all()
+        return [AppointmentRead.model_validate(a) for a in result]
+
+    def find_by_datetime(
+        self, date: dt.date, time: dt.time
+    ) -> Optional[AppointmentRead]:
+        appointment = self.session.exec(_slot_statement(date, time)).first()
         if appointment:
             return AppointmentRead.model_validate(appointment)
         return None
 
+    def find_taken_slots(
+        self, slots: Iterable[tuple[dt.date, dt.time]], chunk_size: int = 500
+    ) -> set[tuple[dt.date, dt.time]]:
+        """
+        Return which of the given (date, time) slots are already booked,
+        using one set-based index lookup per chunk of slots.
+        """
+        slots = list(slots)
+        taken = set()
+        for start in range(0, len(slots), chunk_size):
+            stmt = _taken_slots_statement(slots[start : start + chunk_size])
+            taken.update(tuple(row) for row in self.session.exec(stmt).all())
+        return taken
+
+    def changes_since(
+        self,
+        after_seq: int = 0,
+        *,
+        until_seq: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[AppointmentChange]:
+        """Return change log entries with ``after_seq < seq <= until_seq``."""
+        stmt = _changes_statement(after_seq, until_seq, limit)
+        return list(self.session.exec(stmt).all())
+
+    def last_changes_before(
+        self, appointment_ids: Iterable[int], before_seq: int, chunk_size: int = 500
+    ) -> dict[int, AppointmentChange]:
+        """
+        The last change logged for each appointment at or before
+        ``before_seq``, i.e. its values at that point, keyed by appointment.
+        """
+        ids = list(appointment_ids)
+        last = {}
+        for start in range(0, len(ids), chunk_size):
+            stmt = _last_changes_statement(ids[start : start + chunk_size], before_seq)
+            last.update((c.appointment_id, c) for c in self.session.exec(stmt).all())
+        return last
+
+    def latest_seq(self, appointment_id: Optional[int] = None) -> int:
+        """
+        Sequence number of the last change, or of the last change to one
+        appointment, 0 before the first one.
+        """
+        stmt = _latest_seq_statement(appointment_id)
+        return self.session.exec(stmt).one() or 0
+
+    def create_many(self, items: List[AppointmentCreate]) -> List[int]:
+        """
+        Insert many appointments in a single transaction with one batched
+        INSERT ... RETURNING, and return their ids in input order.
+        """
+        if not items:
+            return []
+        try:
+            result = self.session.exec(
+                _create_many_statement(),
+                params=[item.model_dump() for item in items],
+            )
+            ids = list(result.scalars())
+        except IntegrityError:
+            self.session.rollback()
+            raise
+        stmt, params = _created_changes(items, ids)
+        self.session.exec(stmt, params=params)
+        self._commit()
+        return ids
+
     def create(self, data: AppointmentCreate) -> AppointmentRead:
         appointment = Appointment.model_validate(data)
         self.session.add(appointment)
-        self.session.commit()
+        # The id is needed for the change log entry
+        self._flush()
+        self.session.add(_change(CHANGE_CREATED, appointment))
+        self._commit()
         self.session.refresh(appointment)
         return AppointmentRead.model_validate(appointment)
 
@@ -55,7 +418,8 @@ class SQLiteAppointmentRepository:
             setattr(appointment, key, value)
 
         self.session.add(appointment)
-        self.session.commit()
+        self.session.add(_change(CHANGE_UPDATED, appointment))
+        self._commit()
         self.session.refresh(appointment)
         return AppointmentRead.model_validate(appointment)
 
@@ -64,6 +428,223 @@ class SQLiteAppointmentRepository:
         if not appointment:
             return False
 
+        self.session.add(_change(CHANGE_DELETED, appointment))
         self.session.delete(appointment)
         self.session.commit()
         return True
+
+    def _flush(self) -> None:
+        try:
+            self.session.flush()
+        except IntegrityError:
+            self.session.rollback()
+            raise
+
+    def _commit(self) -> None:
+        # A concurrent writer may take the same slot between the conflict
+        # check and the insert; the unique index turns that into an error.
+        try:
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise
+
+
+class AsyncSQLiteAppointmentRepository:
+    """
+    Async variant of SQLiteAppointmentRepository used by the API routes,
+    so request handlers wait on the database without holding a thread.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def list(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        client_name: Optional[str] = None,
+        after_slot: Optional[tuple[dt.date, dt.time, int]] = None,
+    ) -> List[AppointmentRead]:
+        stmt = _list_statement(
+            limit, after_id, date_from, date_to, client_name, after_slot
+        )
+        result = (await self.session.exec(stmt)).all()
+        return [AppointmentRead.model_validate(a) for a in result]
+
+    async def get(self, appointment_id: int) -> Optional[AppointmentRead]:
+        appointment = await self.session.get(Appointment, appointment_id)
+        if appointment:
+            return AppointmentRead.model_validate(appointment)
+        return None
+
+    async def iter_rows(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        max_id: Optional[int] = None,
+        chunk_size: int = 1000,
+        one_transaction: bool = False,
+    ) -> AsyncIterator[List[tuple]]:
+        last_id = 0
+        while True:
+            stmt = _rows_statement(last_id, date_from, date_to, max_id, chunk_size)
+            rows = [tuple(row) for row in (await self.session.exec(stmt)).all()]
+            if not one_transaction:
+                await self.session.rollback()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    async def snapshot(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+    ) -> tuple[int, int]:
+        result = await self.session.exec(_snapshot_statement(date_from, date_to))
+        count, max_id = result.one()
+        return count, max_id or 0
+
+    async def count_on(self, day: dt.date) -> int:
+        return (await self.session.exec(_day_count_statement(day))).one()
+
+    async def count_by_day(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+    ) -> List[tuple[dt.date, int]]:
+        result = await self.session.exec(_per_day_statement(date_from, date_to))
+        return [tuple(row) for row in result.all()]
+
+    async def count_by_client(
+        self,
+        *,
+        date_from: Optional[dt.date] = None,
+        date_to: Optional[dt.date] = None,
+        limit: int = 10,
+    ) -> List[tuple[str, int]]:
+        stmt = _per_client_statement(date_from, date_to, limit)
+        return [tuple(row) for row in (await self.session.exec(stmt)).all()]
+
+    async def list_between(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> List[AppointmentRead]:
+        result = (await self.session.exec(_between_statement(start, end))).all()
+        return [AppointmentRead.model_validate(a) for a in result]
+
+    async def find_by_datetime(
+        self, date: dt.date, time: dt.time
+    ) -> Optional[AppointmentRead]:
+        appointment = (await self.session.exec(_slot_statement(date, time))).first()
+        if appointment:
+            return AppointmentRead.model_validate(appointment)
+        return None
+
+    async def find_taken_slots(
+        self, slots: Iterable[tuple[dt.date, dt.time]], chunk_size: int = 500
+    ) -> set[tuple[dt.date, dt.time]]:
+        slots = list(slots)
+        taken = set()
+        for start in range(0, len(slots), chunk_size):
+            stmt = _taken_slots_statement(slots[start : start + chunk_size])
+            taken.update(tuple(row) for row in (await self.session.exec(stmt)).all())
+        return taken
+
+    async def changes_since(
+        self,
+        after_seq: int = 0,
+        *,
+        until_seq: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[AppointmentChange]:
+        stmt = _changes_statement(after_seq, until_seq, limit)
+        return list((await self.session.exec(stmt)).all())
+
+    async def last_changes_before(
+        self, appointment_ids: Iterable[int], before_seq: int, chunk_size: int = 500
+    ) -> dict[int, AppointmentChange]:
+        ids = list(appointment_ids)
+        last = {}
+        for start in range(0, len(ids), chunk_size):
+            stmt = _last_changes_statement(ids[start : start + chunk_size], before_seq)
+            changes = (await self.session.exec(stmt)).all()
+            last.update((c.appointment_id, c) for c in changes)
+        return last
+
+    async def latest_seq(self, appointment_id: Optional[int] = None) -> int:
+        stmt = _latest_seq_statement(appointment_id)
+        return (await self.session.exec(stmt)).one() or 0
+
+    async def create_many(self, items: List[AppointmentCreate]) -> List[int]:
+        if not items:
+            return []
+        try:
+            result = await self.session.exec(
+                _create_many_statement(),
+                params=[item.model_dump() for item in items],
+            )
+            ids = list(result.scalars())
+        except IntegrityError:
+            await self.session.rollback()
+            raise
+        stmt, params = _created_changes(items, ids)
+        await self.session.exec(stmt, params=params)
+        await self._commit()
+        return ids
+
+    async def create(self, data: AppointmentCreate) -> AppointmentRead:
+        appointment = Appointment.model_validate(data)
+        self.session.add(appointment)
+        await self._flush()
+        self.session.add(_change(CHANGE_CREATED, appointment))
+        await self._commit()
+        await self.session.refresh(appointment)
+        return AppointmentRead.model_validate(appointment)
+
+    async def update(
+        self, appointment_id: int, data: AppointmentUpdate
+    ) -> Optional[AppointmentRead]:
+        appointment = await self.session.get(Appointment, appointment_id)
+        if not appointment:
+            return None
+
+        update_data = data.model_dump(exclude_unset=True)
+        for key, value in update_data.items():
+            setattr(appointment, key, value)
+
+        self.session.add(appointment)
+        self.session.add(_change(CHANGE_UPDATED, appointment))
+        await self._commit()
+        await self.session.refresh(appointment)
+        return AppointmentRead.model_validate(appointment)
+
+    async def delete(self, appointment_id: int) -> bool:
+        appointment = await self.session.get(Appointment, appointment_id)
+        if not appointment:
+            return False
+
+        self.session.add(_change(CHANGE_DELETED, appointment))
+        await self.session.delete(appointment)
+        await self.session.commit()
+        return True
+
+    async def _flush(self) -> None:
+        try:
+            await self.session.flush()
+        except IntegrityError:
+            await self.session.rollback()
+            raise
+
+    async def _commit(self) -> None:
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise
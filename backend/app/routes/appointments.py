@@ -1,98 +1,524 @@
 """
 FastAPI routes exposing CRUD endpoints for appointments.
-Backed by the SQLite repository.
+Backed by the async SQLite repository.
 """
 
+import base64
+import binascii
 import csv
+import datetime as dt
+import json
+import os
 from io import StringIO
+from typing import AsyncIterable, AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from backend.app.models import AppointmentCreate, AppointmentRead, AppointmentUpdate
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
+from backend.app.models import (
+    AppointmentChangePage,
+    AppointmentCreate,
+    AppointmentRead,
+    AppointmentStats,
+    AppointmentUpdate,
+    BulkImportResult,
+    BulkImportRow,
+)
+from backend.app.core.cache import ResponseCache
 from backend.app.core.deps import get_current_user
-from backend.app.database import get_session
-from backend.app.repository_sqlite import SQLiteAppointmentRepository
+from backend.app.core.redis_client import get_redis
+from backend.app.database import get_async_read_session, get_async_session
+from backend.app.repository_sqlite import AsyncSQLiteAppointmentRepository
 
 router = APIRouter(prefix="/appointments", dependencies=[Depends(get_current_user)])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CHANGE_SEQ_HEADER = "X-Change-Seq"
+DEFAULT_CHANGES_LIMIT = 1000
+DEFAULT_TOP_CLIENTS = 10
+SLOT_TAKEN = "An appointment already exists at this date and time"
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = ["id", "client_name", "date", "time", "notes"]
+MAX_IMPORT_ROWS = 50_000
+ETAG_PREFIX = "appointments-"
 
-def get_repo(session=Depends(get_session)):
-    return SQLiteAppointmentRepository(session)
+APPOINTMENT_CACHE_SIZE = int(os.getenv("APPOINTMENT_CACHE_SIZE", "1024"))
+APPOINTMENT_CACHE_TTL = float(os.getenv("APPOINTMENT_CACHE_TTL", "300"))
+APPOINTMENT_CACHE_REDIS = os.getenv("APPOINTMENT_CACHE_REDIS", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Rendered list pages and appointments. Every write bumps the table scope,
+# which list pages and the ETag version depend on; updates and deletes also
+# bump the scope of the appointment they touch.
+appointment_cache = ResponseCache(
+    APPOINTMENT_CACHE_SIZE,
+    APPOINTMENT_CACHE_TTL,
+    redis=get_redis if APPOINTMENT_CACHE_REDIS else None,
+)
+TABLE_SCOPE = "table"
+
+_appointment_json = TypeAdapter(AppointmentRead)
+_appointment_list_json = TypeAdapter(list[AppointmentRead])
+_stats_json = TypeAdapter(AppointmentStats)
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_slot_cursor(date: dt.date, time: dt.time, last_id: int) -> str:
+    slot = f"{dt.datetime.combine(date, time).isoformat()},{last_id}"
+    return base64.urlsafe_b64encode(slot.encode()).decode()
+
+
+def decode_slot_cursor(cursor: str) -> tuple[dt.date, dt.time, int]:
+    try:
+        slot, last_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        slot = dt.datetime.fromisoformat(slot)
+        return slot.date(), slot.time(), int(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def make_etag(version: int, *qualifiers: str) -> str:
+    return f'"{ETAG_PREFIX}{"-".join([str(version), *qualifiers])}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header, as RFC 9110 asks."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def item_scope(appointment_id: int) -> str:
+    return f"item:{appointment_id}"
+
+
+def cache_key(kind: str, generation: Optional[int], *params) -> Optional[str]:
+    # No generation means the shared cache is unreachable: skip caching
+    if generation is None:
+        return None
+    return f"{kind}:{generation}:{json.dumps(params)}"
+
+
+async def current_version(repo, generation: Optional[int]) -> int:
+    # Every write appends to the change log, so its last sequence number
+    # versions the whole table. Read it before the rows: a write in between
+    # only makes the version older than the body, never newer. Only a cache
+    # shared through Redis sees every process's writes; otherwise ask the
+    # database, where MAX(seq) is a single primary key lookup.
+    shared = appointment_cache.redis is not None
+    key = cache_key("version", generation) if shared else None
+    version = await appointment_cache.get(key) if key else None
+    if version is None:
+        version = await repo.latest_seq()
+        if key:
+            await appointment_cache.set(key, version)
+    return version
+
+
+async def current_etag(repo, generation: Optional[int]) -> str:
+    return make_etag(await current_version(repo, generation))
+
+
+async def cached_json(key: Optional[str], render, etag: str) -> Response:
+    """
+    Serve the JSON body and headers that ``render`` produces, from the
+    cache when possible, so a hit skips both the query and validation.
+    """
+    entry = await appointment_cache.get(key) if key else None
+    if entry is None:
+        entry = await render()
+        if key:
+            await appointment_cache.set(key, entry)
+    return Response(
+        entry["body"],
+        media_type="application/json",
+        headers={**entry["headers"], "ETag": etag},
+    )
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def get_repo(session=Depends(get_async_session)):
+    return AsyncSQLiteAppointmentRepository(session)
+
+
+def get_read_repo(session=Depends(get_async_read_session)):
+    return AsyncSQLiteAppointmentRepository(session)
 
 
 @router.get("/", response_model=list[AppointmentRead])
-def list_appointments(repo=Depends(get_repo)):
-    return repo.list()
+async def list_appointments(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    date_from: Optional[dt.date] = None,
+    date_to: Optional[dt.date] = None,
+    client_name: Optional[str] = None,
+    repo=Depends(get_read_repo),
+):
+    generations = await appointment_cache.generations(TABLE_SCOPE)
+    generation = generations[0] if generations else None
+    version = await current_version(repo, generation)
+    etag = make_etag(version)
+    if cached := not_modified(request, etag):
+        return cached
 
+    # Date ranges are paged by slot and id, along the (date, time) index
+    by_slot = bool(date_from or date_to)
+    after_id = decode_cursor(cursor) if cursor and not by_slot else None
+    after_slot = decode_slot_cursor(cursor) if cursor and by_slot else None
+    client_name = client_name or None
+
+    async def render() -> dict:
+        # Fetch one extra row to know whether another page exists
+        appointments = await repo.list(
+            limit=limit + 1,
+            after_id=after_id,
+            date_from=date_from,
+            date_to=date_to,
+            client_name=client_name,
+            after_slot=after_slot,
+        )
+        headers = {}
+        if len(appointments) > limit:
+            appointments = appointments[:limit]
+            last = appointments[-1]
+            headers[NEXT_CURSOR_HEADER] = (
+                encode_slot_cursor(last.date, last.time, last.id)
+                if by_slot
+                else encode_cursor(last.id)
+            )
+        body = _appointment_list_json.dump_json(appointments).decode()
+        return {"body": body, "headers": headers}
+
+    # Keyed on the version as well: without Redis, writes made by another
+    # process do not bump this one's generation
+    key = cache_key(
+        "list",
+        generation,
+        version,
+        limit,
+        after_id,
+        after_slot and encode_slot_cursor(*after_slot),
+        date_from and date_from.isoformat(),
+        date_to and date_to.isoformat(),
+        client_name,
+    )
+    response = await cached_json(key, render, etag)
+    # Changes after this sequence number are not in the rows: clients that
+    # keep a copy continue from it with GET /appointments/changes
+    response.headers[CHANGE_SEQ_HEADER] = str(version)
+    return response
 
-@router.get("/export")
-def export_appointments(repo=Depends(get_repo)):
-    appointments = repo.list()
 
+@router.get("/changes", response_model=AppointmentChangePage)
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    repo=Depends(get_read_repo),
+):
+    """
+    Creates, updates and deletes after ``since``, so a client holding a copy
+    of the list can catch up without downloading it again. A latest_seq
+    below ``since`` means the database was reset: reload the list.
+    """
+    generations = await appointment_cache.generations(TABLE_SCOPE)
+    latest = await current_version(repo, generations[0] if generations else None)
+    # Nothing new, the usual answer to a poll, needs no query
+    if since >= latest:
+        return AppointmentChangePage(latest_seq=latest, has_more=False, changes=[])
+
+    changes = await repo.changes_since(since, until_seq=latest, limit=limit + 1)
+    return AppointmentChangePage(
+        latest_seq=latest, has_more=len(changes) > limit, changes=changes[:limit]
+    )
+
+
+@router.get("/stats", response_model=AppointmentStats)
+async def appointment_stats(
+    request: Request,
+    date_from: Optional[dt.date] = None,
+    date_to: Optional[dt.date] = None,
+    today: Optional[dt.date] = None,
+    top_clients: int = Query(DEFAULT_TOP_CLIENTS, ge=1, le=MAX_PAGE_SIZE),
+    breakdown: bool = True,
+    repo=Depends(get_read_repo),
+):
+    """
+    Counts computed with SQL aggregates, so dashboards need not download
+    the appointments to show them. ``today`` defaults to the server's date;
+    clients in another time zone pass their own. With ``breakdown=false``
+    only the totals are computed and ``per_day``/``per_client`` are empty.
+    """
+    today = today or dt.date.today()
+    generations = await appointment_cache.generations(TABLE_SCOPE)
+    generation = generations[0] if generations else None
+    # The day is part of the tag: "today" changes at midnight without a write
+    version = await current_version(repo, generation)
+    etag = make_etag(version, today.isoformat())
+    if cached := not_modified(request, etag):
+        return cached
+
+    async def render() -> dict:
+        total, _ = await repo.snapshot(date_from=date_from, date_to=date_to)
+        per_day, per_client = [], []
+        if breakdown:
+            per_day = await repo.count_by_day(date_from=date_from, date_to=date_to)
+            per_client = await repo.count_by_client(
+                date_from=date_from, date_to=date_to, limit=top_clients
+            )
+        stats = AppointmentStats(
+            total=total,
+            today=await repo.count_on(today),
+            per_day=[{"date": date, "count": count} for date, count in per_day],
+            per_client=[
+                {"client_name": name, "count": count} for name, count in per_client
+            ],
+        )
+        return {"body": _stats_json.dump_json(stats).decode(), "headers": {}}
+
+    key = cache_key(
+        "stats",
+        generation,
+        version,
+        date_from and date_from.isoformat(),
+        date_to and date_to.isoformat(),
+        today.isoformat(),
+        top_clients,
+        breakdown,
+    )
+    return await cached_json(key, render, etag)
+
+
+async def _csv_chunks(chunks: AsyncIterable[list[tuple]]) -> AsyncIterator[str]:
     output = StringIO()
     writer = csv.writer(output)
-    writer.writerow(["id", "client_name", "date", "time", "notes"])
-    for appointment in appointments:
-        writer.writerow(
-            [
-                appointment.id,
-                appointment.client_name,
-                appointment.date,
-                appointment.time,
-                appointment.notes or "",
-            ]
-        )
+    writer.writerow(EXPORT_COLUMNS)
 
-    return Response(
-        content=output.getvalue(),
+    async for rows in chunks:
+        for appointment_id, client_name, date, time, notes in rows:
+            writer.writerow([appointment_id, client_name, date, time, notes or ""])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+
+    # Header only, when there are no rows at all
+    if output.tell():
+        yield output.getvalue()
+
+
+@router.get("/export")
+async def export_appointments(
+    request: Request,
+    date_from: Optional[dt.date] = None,
+    date_to: Optional[dt.date] = None,
+    repo=Depends(get_read_repo),
+):
+    generations = await appointment_cache.generations(TABLE_SCOPE)
+    etag = await current_etag(repo, generations[0] if generations else None)
+    if cached := not_modified(request, etag):
+        return cached
+
+    chunks = repo.iter_rows(
+        date_from=date_from, date_to=date_to, chunk_size=EXPORT_CHUNK_SIZE
+    )
+    return StreamingResponse(
+        _csv_chunks(chunks),
         media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=appointments.csv"},
+        headers={
+            "Content-Disposition": "attachment; filename=appointments.csv",
+            "ETag": etag,
+        },
     )
 
 
 @router.get("/{appointment_id}", response_model=AppointmentRead)
-def get_appointment(appointment_id: int, repo=Depends(get_repo)):
-    appointment = repo.get(appointment_id)
-    if not appointment:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    return appointment
+async def get_appointment(
+    appointment_id: int, request: Request, repo=Depends(get_read_repo)
+):
+    generations = await appointment_cache.generations(
+        TABLE_SCOPE, item_scope(appointment_id)
+    )
+    table, item = generations or (None, None)
+    etag = await current_etag(repo, table)
+    if cached := not_modified(request, etag):
+        return cached
+
+    async def render() -> dict:
+        appointment = await repo.get(appointment_id)
+        if not appointment:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        body = _appointment_json.dump_json(appointment).decode()
+        return {"body": body, "headers": {}}
+
+    # Keyed on the appointment's last change as well: without Redis, writes
+    # made by another process do not bump this one's item generation
+    shared = appointment_cache.redis is not None
+    item_version = None if shared else await repo.latest_seq(appointment_id)
+    key = cache_key("item", item, item_version, appointment_id)
+    return await cached_json(key, render, etag)
 
 
 @router.post("/", response_model=AppointmentRead, status_code=status.HTTP_201_CREATED)
-def create_appointment(data: AppointmentCreate, repo=Depends(get_repo)):
+async def create_appointment(data: AppointmentCreate, repo=Depends(get_repo)):
     # Prevent empty or invalid fields
     if not data.client_name.strip():
         raise HTTPException(status_code=400, detail="Client name cannot be empty")
-    if not data.date.strip() or not data.time.strip():
-        raise HTTPException(status_code=400, detail="Date and time are required")
 
     # conflict prevention
-    existing = repo.find_by_datetime(data.date, data.time)
+    existing = await repo.find_by_datetime(data.date, data.time)
     if existing:
+        raise HTTPException(status_code=409, detail=SLOT_TAKEN)
+
+    try:
+        appointment = await repo.create(data)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=SLOT_TAKEN)
+    await appointment_cache.invalidate(TABLE_SCOPE)
+    return appointment
+
+
+async def _import_rows(rows: list[dict], repo) -> BulkImportResult:
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_IMPORT_ROWS} rows per import"
+        )
+
+    results: list[BulkImportRow] = []
+    valid: list[tuple[int, AppointmentCreate]] = []
+    for index, row in enumerate(rows):
+        try:
+            data = AppointmentCreate.model_validate(row)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            results.append(
+                BulkImportRow(
+                    row=index, status="invalid", detail=f"{field}: {error['msg']}"
+                )
+            )
+            continue
+        if not data.client_name.strip():
+            results.append(
+                BulkImportRow(
+                    row=index, status="invalid", detail="Client name cannot be empty"
+                )
+            )
+            continue
+        valid.append((index, data))
+
+    # Conflicts against existing rows and within the batch (first row wins)
+    taken = await repo.find_taken_slots({(data.date, data.time) for _, data in valid})
+    to_create: list[tuple[int, AppointmentCreate]] = []
+    for index, data in valid:
+        slot = (data.date, data.time)
+        if slot in taken:
+            results.append(
+                BulkImportRow(row=index, status="conflict", detail=SLOT_TAKEN)
+            )
+            continue
+        taken.add(slot)
+        to_create.append((index, data))
+
+    try:
+        ids = await repo.create_many([data for _, data in to_create])
+    except IntegrityError:
         raise HTTPException(
             status_code=409,
-            detail="An appointment already exists at this date and time",
+            detail="Conflicting appointments were created during the import",
         )
+    if ids:
+        await appointment_cache.invalidate(TABLE_SCOPE)
+    for (index, _), appointment_id in zip(to_create, ids):
+        results.append(BulkImportRow(row=index, status="created", id=appointment_id))
+
+    results.sort(key=lambda result: result.row)
+    return BulkImportResult(
+        created=len(to_create),
+        conflicts=sum(1 for r in results if r.status == "conflict"),
+        invalid=sum(1 for r in results if r.status == "invalid"),
+        results=results,
+    )
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_appointments(
+    rows: list[dict] = Body(...), repo=Depends(get_repo)
+):
+    return await _import_rows(rows, repo)
+
+
+@router.post("/import", response_model=BulkImportResult)
+async def import_appointments_csv(file: UploadFile, repo=Depends(get_repo)):
+    try:
+        text = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8")
 
-    return repo.create(data)
+    # Accepts the export format; the id column, if present, is ignored
+    rows = [
+        {key: value or None for key, value in row.items() if key != "id"}
+        for row in csv.DictReader(StringIO(text))
+    ]
+    return await _import_rows(rows, repo)
 
 
 @router.put("/{appointment_id}", response_model=AppointmentRead)
-def update_appointment(
+async def update_appointment(
     appointment_id: int, data: AppointmentUpdate, repo=Depends(get_repo)
 ):
     # Reject update with no fields provided
     if not any([data.client_name, data.date, data.time, data.notes]):
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    appointment = repo.update(appointment_id, data)
+    try:
+        appointment = await repo.update(appointment_id, data)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=SLOT_TAKEN)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    await appointment_cache.invalidate(TABLE_SCOPE, item_scope(appointment_id))
     return appointment
 
 
 @router.delete("/{appointment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_appointment(appointment_id: int, repo=Depends(get_repo)):
-    deleted = repo.delete(appointment_id)
+async def delete_appointment(appointment_id: int, repo=Depends(get_repo)):
+    deleted = await repo.delete(appointment_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    await appointment_cache.invalidate(TABLE_SCOPE, item_scope(appointment_id))
     return
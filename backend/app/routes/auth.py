@@ -1,51 +1,98 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from backend.app.core.deps import require_role
 from backend.app.core.security import (
+    PasswordHashingBusy,
     create_access_token,
-    get_password_hash,
-    verify_password,
+    hash_password_async,
+    verify_and_update_password_async,
 )
-from backend.app.database import get_session
-from backend.app.models import Token, User, UserCreate
+from backend.app.database import get_async_read_session, get_async_session
+from backend.app.models import Token, User, UserCreate, UserRead
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+USER_EXISTS = "User already exists"
+
+hashing_busy = HTTPException(
+    status_code=503,
+    detail="Too many login attempts in progress, try again shortly",
+    headers={"Retry-After": "1"},
+)
+
 
 @router.post("/register", response_model=Token)
-def register(user_in: UserCreate, session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.username == user_in.username)).first()
-    if user:
-        raise HTTPException(status_code=400, detail="User already exists")
+async def register(
+    user_in: UserCreate,
+    read_session: AsyncSession = Depends(get_async_read_session),
+    session: AsyncSession = Depends(get_async_session),
+):
+    result = await read_session.exec(
+        select(User).where(User.username == user_in.username)
+    )
+    if result.first():
+        raise HTTPException(status_code=400, detail=USER_EXISTS)
+
+    # Hash before touching the writer so the write connection is not held
+    # while bcrypt runs
+    try:
+        hashed_password = await hash_password_async(user_in.password)
+    except PasswordHashingBusy:
+        raise hashing_busy
 
     db_user = User(
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashed_password,
         role="user",
     )
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Registered concurrently while the password was being hashed
+        await session.rollback()
+        raise HTTPException(status_code=400, detail=USER_EXISTS)
+    await session.refresh(db_user)
 
     access_token = create_access_token(subject=db_user.username)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/token", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
+    write_session: AsyncSession = Depends(get_async_session),
 ):
-    user = session.exec(select(User).where(User.username == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    result = await session.exec(select(User).where(User.username == form_data.username))
+    user = result.first()
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+
+    try:
+        valid, new_hash = await verify_and_update_password_async(
+            form_data.password, user.hashed_password
+        )
+    except PasswordHashingBusy:
+        raise hashing_busy
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
+    # Stored hash uses an old bcrypt cost: upgrade it now that we know the password
+    if new_hash:
+        await write_session.exec(
+            update(User).where(User.id == user.id).values(hashed_password=new_hash)
+        )
+        await write_session.commit()
+
     access_token = create_access_token(subject=user.username)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/admin/ping")
-def admin_ping(current_user: User = Depends(require_role("admin"))):
+async def admin_ping(current_user: UserRead = Depends(require_role("admin"))):
     return {"status": "ok", "user": current_user.username}
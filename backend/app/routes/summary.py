@@ -1,31 +1,132 @@
+import datetime as dt
+import hashlib
 import json
-import redis
-from fastapi import APIRouter, Depends
+import os
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
 
 from backend.app.core.deps import get_current_user
-from backend.app.routes.appointments import get_repo
+from backend.app.core.redis_client import get_redis
+from backend.app.database import get_async_read_session
+from backend.app.models import UserRead
+from backend.app.repository_sqlite import AsyncSQLiteAppointmentRepository
 
 router = APIRouter(prefix="/summary", dependencies=[Depends(get_current_user)])
 
-redis_client = redis.Redis(host="redis", port=6379, decode_responses=True)
-
 SUMMARY_QUEUE = "summary_jobs"
+# "list" (default) or "stream"; must match the worker's SUMMARY_TRANSPORT
+SUMMARY_TRANSPORT = os.getenv("SUMMARY_TRANSPORT", "list")
+SUMMARY_STREAM = "summary_stream"
 SUMMARY_RESULT_KEY = "latest_summary"
+SUMMARY_METRICS_KEY = "summary_metrics"
+SUMMARY_JOB_PREFIX = "summary_job:"
+SUMMARY_PENDING_PREFIX = "summary_pending:"
+SUMMARY_JOB_TTL = int(os.getenv("SUMMARY_JOB_TTL", str(24 * 60 * 60)))
+# How long identical requests are pointed at a queued job. Short, so a job
+# that was lost or could not be queued stops absorbing requests soon.
+SUMMARY_PENDING_TTL = int(os.getenv("SUMMARY_PENDING_TTL", "600"))
+
+
+def get_repo(session=Depends(get_async_read_session)):
+    return AsyncSQLiteAppointmentRepository(session)
+
+
+def result_key(username: str) -> str:
+    return f"{SUMMARY_RESULT_KEY}:{username}"
+
+
+def job_fingerprint(username: str, filters: dict, max_id: int, count: int) -> str:
+    """Jobs with the same fingerprint would summarise the same rows."""
+    payload = json.dumps([username, filters, max_id, count], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _utcnow() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
 
 
 @router.post("/")
-def queue_summary_job(repo=Depends(get_repo)):
-    appointments = repo.list()
-    job_data = {"appointments": [a.model_dump() for a in appointments]}
+async def queue_summary_job(
+    date_from: Optional[dt.date] = None,
+    date_to: Optional[dt.date] = None,
+    repo=Depends(get_repo),
+    redis_client=Depends(get_redis),
+    current_user: UserRead = Depends(get_current_user),
+):
+    # The job references the data instead of carrying it: the worker reads
+    # the matching rows from the database, up to the snapshot's max id.
+    count, max_id = await repo.snapshot(date_from=date_from, date_to=date_to)
+    # Change log watermark, for incremental updates of the previous summary
+    seq = await repo.latest_seq()
+    filters = {
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None,
+    }
+    fingerprint = job_fingerprint(current_user.username, filters, max_id, count)
 
-    redis_client.lpush(SUMMARY_QUEUE, json.dumps(job_data))
+    # An equivalent job that has not started yet will produce the same
+    # summary, so hand out its id instead of queueing another one. The
+    # worker clears the marker when it starts the job. Claiming and reading
+    # the marker in one transaction leaves no gap between the two.
+    job_id = uuid.uuid4().hex
+    pending_key = SUMMARY_PENDING_PREFIX + fingerprint
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(pending_key, job_id, nx=True, ex=SUMMARY_PENDING_TTL)
+        pipe.get(pending_key)
+        claimed, pending_id = await pipe.execute()
+    if not claimed:
+        # No status yet means the request that claimed the marker is still
+        # queueing the job. Any other state than queued means the marker
+        # outlived its job: take it over and queue a fresh one.
+        pending_status = await redis_client.hget(
+            SUMMARY_JOB_PREFIX + pending_id, "status"
+        )
+        if pending_status in (None, "queued"):
+            await redis_client.hincrby(SUMMARY_METRICS_KEY, "coalesced_on_enqueue", 1)
+            return {"status": "queued", "count": count, "job_id": pending_id}
+        await redis_client.set(pending_key, job_id, ex=SUMMARY_PENDING_TTL)
 
-    return {"status": "queued", "count": len(appointments)}
+    job_data = {
+        "job_id": job_id,
+        "username": current_user.username,
+        "fingerprint": fingerprint,
+        "filters": filters,
+        "max_id": max_id,
+        "seq": seq,
+        "count": count,
+    }
+
+    # The status hash is written in the same round trip as the job, and
+    # before it, so the worker only ever moves it forward
+    job_key = SUMMARY_JOB_PREFIX + job_id
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(
+            job_key,
+            mapping={
+                "status": "queued",
+                "username": current_user.username,
+                "count": count,
+                "queued_at": _utcnow(),
+            },
+        )
+        pipe.expire(job_key, SUMMARY_JOB_TTL)
+        if SUMMARY_TRANSPORT == "stream":
+            pipe.xadd(SUMMARY_STREAM, {"job": json.dumps(job_data)})
+        else:
+            pipe.lpush(SUMMARY_QUEUE, json.dumps(job_data))
+        await pipe.execute()
+
+    return {"status": "queued", "count": count, "job_id": job_id}
 
 
 @router.get("/result")
-def get_summary_result():
-    result = redis_client.get(SUMMARY_RESULT_KEY)
+async def get_summary_result(
+    redis_client=Depends(get_redis),
+    current_user: UserRead = Depends(get_current_user),
+):
+    result = await redis_client.get(result_key(current_user.username))
 
     if not result:
         return {"status": "pending", "summary": None}
@@ -34,3 +135,33 @@ def get_summary_result():
         "status": "ready",
         "summary": result,
     }
+
+
+@router.get("/metrics")
+async def get_summary_metrics(redis_client=Depends(get_redis)):
+    # Counters, plus the worker's circuit breaker state as text
+    counters = {
+        key: int(value) if value.isdigit() else value
+        for key, value in (await redis_client.hgetall(SUMMARY_METRICS_KEY)).items()
+    }
+    hits = counters.get("cache_hits", 0)
+    lookups = hits + counters.get("cache_misses", 0)
+    return {
+        **counters,
+        "cache_hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+@router.get("/{job_id}")
+async def get_summary_job(
+    job_id: str,
+    redis_client=Depends(get_redis),
+    current_user: UserRead = Depends(get_current_user),
+):
+    job = await redis_client.hgetall(SUMMARY_JOB_PREFIX + job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if not job or job.get("username") != current_user.username:
+        raise HTTPException(status_code=404, detail="Summary job not found")
+
+    job.pop("username")
+    return {"job_id": job_id, **job, "count": int(job.get("count", 0))}
@@ -0,0 +1,117 @@
+"""
+Compact text encoding of appointments for summary prompts.
+
+Rows are grouped under their date as ``time|client|notes`` lines, leaving out
+ids, empty notes and zero seconds. That is several times smaller than
+indented JSON, which repeats every key on every row.
+"""
+
+import math
+import re
+
+HEADER = "Appointments grouped by date, one per line as time|client|notes:"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for budgeting: words cost about one token per four
+    characters, and punctuation and indentation runs one token each.
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() else 1
+        for piece in _TOKEN_PATTERN.findall(text)
+    )
+
+
+def _clean(value) -> str:
+    # The separator and line breaks inside values would break the layout
+    return " ".join(str(value).replace("|", "/").split())
+
+
+def _short_time(value: str) -> str:
+    value = value or ""
+    return value[:5] if value[5:].strip(":0.") == "" else value
+
+
+def _by_date(appointments: list[dict]) -> dict[str, list[dict]]:
+    days: dict[str, list[dict]] = {}
+    for appointment in sorted(
+        appointments, key=lambda a: (a.get("date") or "", a.get("time") or "")
+    ):
+        days.setdefault(appointment.get("date") or "", []).append(appointment)
+    return days
+
+
+def encode_row(row: dict) -> str:
+    fields = [_short_time(row.get("time")), _clean(row.get("client_name", ""))]
+    if row.get("notes"):
+        fields.append(_clean(row["notes"]))
+    return "|".join(fields)
+
+
+def encode_appointments(appointments: list[dict]) -> str:
+    lines = [HEADER]
+    for date, rows in _by_date(appointments).items():
+        lines.append(f"{date} ({len(rows)})")
+        lines.extend(encode_row(row) for row in rows)
+    return "\n".join(lines)
+
+
+def encode_daily_totals(appointments: list[dict]) -> str:
+    """Per-date aggregate, for sets too large to list row by row."""
+    lines = ["Appointment totals per date as date|appointments|clients|first|last:"]
+    for date, rows in _by_date(appointments).items():
+        clients = {row.get("client_name") for row in rows}
+        times = [_short_time(row.get("time")) for row in rows]
+        lines.append(f"{date}|{len(rows)}|{len(clients)}|{times[0]}|{times[-1]}")
+    return "\n".join(lines)
+
+
+def fit_to_budget(appointments: list[dict], budget: int) -> str:
+    """
+    Encode ``appointments`` within ``budget`` estimated tokens: row by row if
+    it fits, otherwise as daily totals, truncated with a note as a last
+    resort.
+    """
+    text = encode_appointments(appointments)
+    if estimate_tokens(text) <= budget:
+        return text
+
+    lines = encode_daily_totals(appointments).split("\n")
+    used = 0
+    for index, line in enumerate(lines):
+        used += estimate_tokens(line)
+        if used > budget:
+            omitted = len(lines) - index
+            return "\n".join(lines[:index] + [f"... {omitted} more dates omitted"])
+    return "\n".join(lines)
+
+
+def encode_changes(changes: list[dict]) -> str:
+    """
+    Change log entries in order, as ``change|id|date|time|client|notes``.
+    Updates that know their previous slot end with ``|was date time``.
+    """
+    lines = [
+        "Changes in order, one per line as change|id|date|time|client|notes; "
+        "updates end with |was followed by the slot before the update:"
+    ]
+    for change in changes:
+        fields = [
+            change["op"],
+            str(change.get("appointment_id", "")),
+            change.get("date") or "",
+            _short_time(change.get("time")),
+            _clean(change.get("client_name", "")),
+            _clean(change.get("notes") or ""),
+        ]
+        if change.get("old_date"):
+            fields.append(
+                f"was {change['old_date']} {_short_time(change.get('old_time'))}"
+            )
+        elif not fields[-1]:
+            fields.pop()
+        lines.append("|".join(fields))
+    return "\n".join(lines)
@@ -0,0 +1,80 @@
+"""
+Retry backoff and a circuit breaker for calls to the LLM provider.
+"""
+
+import random
+import time
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Exponential backoff with full jitter: a random delay up to
+    ``base * 2**attempt`` seconds, capped at ``cap``. The jitter keeps
+    workers that failed together from retrying together.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures, so calls fail
+    fast instead of reaching a provider that is down. After
+    ``reset_timeout`` seconds one trial call is let through ("half_open"):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    def retry_after(self) -> float:
+        """Seconds until a call may be attempted again; 0 unless open."""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not be made now."""
+        if self.state == "open":
+            remaining = self.retry_after()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = "half_open"
+            self._trial_running = False
+
+        if self.state == "half_open":
+            if self._trial_running:
+                raise CircuitOpenError(self.reset_timeout)
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_running = False
+
+    def record_cancelled(self) -> None:
+        """A call given up before it finished counts neither way."""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
@@ -1,13 +1,110 @@
 import asyncio
+import datetime as dt
+import hashlib
 import json
 import os
+import signal
+import socket
+import time
+from typing import Optional
+
 import redis.asyncio as redis
+from redis.exceptions import WatchError
 from pydantic_ai import Agent
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.app.database import async_read_engine
+from backend.app.repository_sqlite import AsyncSQLiteAppointmentRepository
+from backend.app.workers.prompt_encoding import (
+    encode_appointments,
+    encode_changes,
+    encode_row,
+    estimate_tokens,
+    fit_to_budget,
+)
+from backend.app.workers.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+)
+from backend.app.workers.transports import ListQueue, StreamQueue
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 QUEUE = "summary_jobs"
 SUMMARY_RESULT_KEY = "latest_summary"
+LOAD_CHUNK_SIZE = int(os.getenv("SUMMARY_LOAD_CHUNK_SIZE", "1000"))
+# Jobs are almost entirely network wait, so several can run at once
+WORKER_CONCURRENCY = int(os.getenv("SUMMARY_WORKER_CONCURRENCY", "4"))
+JOB_TIMEOUT = float(os.getenv("SUMMARY_JOB_TIMEOUT", "120"))
+
+# "list" (default) or "stream" for the consumer-group transport; must match
+# the API's SUMMARY_TRANSPORT
+SUMMARY_TRANSPORT = os.getenv("SUMMARY_TRANSPORT", "list")
+STREAM = "summary_stream"
+STREAM_GROUP = "summary_workers"
+DEAD_LETTER_STREAM = "summary_dead_letter"
+CONSUMER_NAME = os.getenv(
+    "SUMMARY_CONSUMER_NAME", f"{socket.gethostname()}-{os.getpid()}"
+)
+MAX_DELIVERIES = int(os.getenv("SUMMARY_MAX_DELIVERIES", "3"))
+# Longer than a job may run, so a live worker's entries are never taken over
+CLAIM_IDLE_MS = int(
+    os.getenv("SUMMARY_CLAIM_IDLE_MS", str(int((JOB_TIMEOUT + 30) * 1000)))
+)
+
+# Agent calls are retried with jittered exponential backoff; after
+# BREAKER_THRESHOLD consecutive failures the breaker fails calls fast for
+# BREAKER_RESET seconds and jobs are put back on the queue
+AGENT_ATTEMPTS = int(os.getenv("SUMMARY_AGENT_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("SUMMARY_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("SUMMARY_RETRY_MAX_DELAY", "10"))
+BREAKER_THRESHOLD = int(os.getenv("SUMMARY_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("SUMMARY_BREAKER_RESET", "30"))
+FETCH_MAX_DELAY = 30.0
+
+# Bump when the prompt changes so cached summaries from the old prompt are
+# not reused
+PROMPT_VERSION = "3"
+SUMMARY_CACHE_PREFIX = "summary_cache:"
+SUMMARY_CACHE_INDEX = "summary_cache_index"
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(24 * 60 * 60)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1000"))
+SUMMARY_METRICS_KEY = "summary_metrics"
+SUMMARY_JOB_PREFIX = "summary_job:"
+SUMMARY_PENDING_PREFIX = "summary_pending:"
+# Queued jobs, next in line, searched for duplicates of a starting job
+COALESCE_SCAN = int(os.getenv("SUMMARY_COALESCE_SCAN", "100"))
+SUMMARY_JOB_TTL = int(os.getenv("SUMMARY_JOB_TTL", str(24 * 60 * 60)))
+# Sets larger than this are summarised in chunks of calendar windows and the
+# partial summaries combined, in stages if they exceed the prompt budget
+SUMMARY_CHUNK_ROWS = int(os.getenv("SUMMARY_CHUNK_ROWS", "500"))
+SUMMARY_CHUNK_CONCURRENCY = int(os.getenv("SUMMARY_CHUNK_CONCURRENCY", "4"))
+# Estimated tokens of appointment data per prompt; larger sets are sent as
+# daily totals instead of row by row
+PROMPT_TOKEN_BUDGET = int(os.getenv("SUMMARY_PROMPT_TOKEN_BUDGET", "30000"))
+# A user's last unfiltered summary is kept with the change log sequence it
+# covers. While few changes happened since, the next summary updates it
+# instead of re-reading every appointment; after INCREMENTAL_MAX_RUNS updates
+# in a row a full run starts over to stop drift. 0 disables updates.
+SUMMARY_STATE_PREFIX = "summary_state:"
+INCREMENTAL_MAX_CHANGES = int(os.getenv("SUMMARY_INCREMENTAL_MAX_CHANGES", "200"))
+INCREMENTAL_MAX_RUNS = int(os.getenv("SUMMARY_INCREMENTAL_MAX_RUNS", "10"))
+
+FULL_INSTRUCTION = "Generate a helpful summary for these appointments:"
+CHUNK_INSTRUCTION = (
+    "Summarise these appointments. The summary will be combined with those of "
+    "other dates, so keep counts and notable details:"
+)
+INCREMENTAL_INSTRUCTION = (
+    "Below is a summary of the appointments, followed by the appointments "
+    "created, updated or deleted since it was written. Write the updated "
+    "summary:"
+)
+REDUCE_INSTRUCTION = (
+    "Combine these summaries of appointments on different dates into one "
+    "helpful summary of all appointments:"
+)
 
 if not GOOGLE_API_KEY:
     raise RuntimeError("GOOGLE_API_KEY environment variable is missing!")
@@ -15,45 +112,698 @@ if not GOOGLE_API_KEY:
 # Use Google Gemini with API key
 MODEL_NAME = os.getenv("GOOGLE_MODEL", "google-gla:gemini-2.5-flash")
 agent = Agent(MODEL_NAME, api_key=GOOGLE_API_KEY)
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+
+
+def build_prompt(appointments: list[dict], instruction: str = FULL_INSTRUCTION) -> str:
+    return f"{instruction}\n{fit_to_budget(appointments, PROMPT_TOKEN_BUDGET)}"
+
+
+async def call_agent(prompt: str) -> str:
+    """
+    Run the agent through the circuit breaker, retrying failures up to
+    AGENT_ATTEMPTS times with jittered exponential backoff. Raises
+    CircuitOpenError without calling the provider while the breaker is open.
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await agent.run(prompt)
+        except asyncio.CancelledError:
+            # The job timed out, or a sibling chunk failed and gather_or_cancel
+            # cut the rest. Either way the job counts once: run_job records
+            # the timeout, the failed sibling recorded its own failure.
+            breaker.record_cancelled()
+            raise
+        except Exception:
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= AGENT_ATTEMPTS:
+                raise
+            await asyncio.sleep(
+                backoff_delay(attempt - 1, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+            )
+        else:
+            breaker.record_success()
+            return str(result.data)
+
+
+async def generate_summary(
+    appointments: list[dict], instruction: str = FULL_INSTRUCTION
+) -> str:
+    return await call_agent(build_prompt(appointments, instruction))
+
+
+async def combine_summaries(partials: list[str]) -> str:
+    return await call_agent(REDUCE_INSTRUCTION + "\n\n" + "\n\n".join(partials))
+
+
+async def update_summary(previous: str, changes: list[dict]) -> str:
+    return await call_agent(
+        f"{INCREMENTAL_INSTRUCTION}\n\n{previous}\n\n{encode_changes(changes)}"
+    )
+
+
+def summary_cache_key(
+    appointments: list[dict], instruction: str = FULL_INSTRUCTION
+) -> str:
+    """
+    Stable content hash of an appointment set, the model, the prompt version
+    and the instruction. Rows are hashed one by one in id order, so the key
+    does not depend on row order and no second copy of the set is built.
+    """
+    digest = hashlib.sha256(f"{MODEL_NAME}\n{PROMPT_VERSION}\n{instruction}\n".encode())
+    for appointment in sorted(appointments, key=lambda a: a.get("id") or 0):
+        row = json.dumps(appointment, sort_keys=True, separators=(",", ":"))
+        digest.update(row.encode() + b"\n")
+    return SUMMARY_CACHE_PREFIX + digest.hexdigest()
+
+
+async def _cached(client, key: str, produce) -> str:
+    """
+    Return the summary stored under ``key``, calling ``produce`` only on a
+    miss. Entries expire after SUMMARY_CACHE_TTL and the least recently used
+    are dropped beyond SUMMARY_CACHE_MAX_ENTRIES.
+    """
+    cached = await client.get(key)
+    if cached is not None:
+        await client.hincrby(SUMMARY_METRICS_KEY, "cache_hits", 1)
+        await client.zadd(SUMMARY_CACHE_INDEX, {key: time.time()})
+        return cached.decode() if isinstance(cached, bytes) else cached
+
+    await client.hincrby(SUMMARY_METRICS_KEY, "cache_misses", 1)
+    summary = await produce()
+
+    await client.set(key, summary, ex=SUMMARY_CACHE_TTL)
+    await client.zadd(SUMMARY_CACHE_INDEX, {key: time.time()})
+    excess = await client.zcard(SUMMARY_CACHE_INDEX) - SUMMARY_CACHE_MAX_ENTRIES
+    if excess > 0:
+        evicted = [
+            member for member, _ in await client.zpopmin(SUMMARY_CACHE_INDEX, excess)
+        ]
+        await client.delete(*evicted)
+    return summary
+
+
+async def cached_summary(
+    client, appointments: list[dict], instruction: str = FULL_INSTRUCTION
+) -> str:
+    """Summarise ``appointments`` unless the same set was summarised before."""
+    return await _cached(
+        client,
+        summary_cache_key(appointments, instruction),
+        lambda: generate_summary(appointments, instruction),
+    )
+
+
+def _month(date: str) -> str:
+    return date[:7]
+
+
+def _week(date: str) -> str:
+    try:
+        day = dt.date.fromisoformat(date)
+    except ValueError:
+        return date
+    return (day - dt.timedelta(days=day.weekday())).isoformat()
+
+
+def _day(date: str) -> str:
+    return date
+
+
+# Ever smaller calendar windows a set is split along, until each part fits
+CHUNK_WINDOWS = (_month, _week, _day)
+
+
+def _fits(rows: list[dict], max_rows: int, budget: int) -> bool:
+    return len(rows) <= max_rows and (
+        estimate_tokens(encode_appointments(rows)) <= budget
+    )
+
+
+def _slices(rows: list[dict], max_rows: int, budget: int) -> list[list[dict]]:
+    # One date beyond the limits: consecutive slices within both of them
+    chunks, chunk, used = [], [], 0
+    for row in rows:
+        cost = estimate_tokens(encode_row(row))
+        if chunk and (len(chunk) >= max_rows or used + cost > budget):
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(row)
+        used += cost
+    return chunks + [chunk] if chunk else chunks
+
+
+def _split(rows: list[dict], level: int, max_rows: int, budget: int):
+    if _fits(rows, max_rows, budget):
+        return [rows]
+    if level == len(CHUNK_WINDOWS):
+        return _slices(rows, max_rows, budget)
+
+    windows: dict[str, list[dict]] = {}
+    for row in rows:
+        windows.setdefault(CHUNK_WINDOWS[level](row.get("date") or ""), []).append(row)
+    return [
+        chunk
+        for window in windows.values()
+        for chunk in _split(window, level + 1, max_rows, budget)
+    ]
+
+
+def split_into_chunks(
+    appointments: list[dict], max_rows: int, budget: int = PROMPT_TOKEN_BUDGET
+) -> list[list[dict]]:
+    """
+    Split into chunks of at most ``max_rows`` rows and ``budget`` estimated
+    prompt tokens, in date order. A set that is too large is split by
+    calendar month, a month that is still too large by week, then by day,
+    and a single day into slices. Sparse data thus packs many dates into one
+    call, and since the windows are fixed, a change to one date leaves the
+    chunks, and so the cache keys, of other windows untouched.
+    """
+    rows = sorted(appointments, key=lambda a: (a.get("date") or "", a.get("id") or 0))
+    return _split(rows, 0, max_rows, budget)
+
+
+def _pack_summaries(partials: list[str], budget: int) -> list[list[str]]:
+    """
+    Group consecutive summaries within ``budget`` estimated tokens. Groups
+    hold at least two, so every reduce stage at least halves the count.
+    """
+    groups, group, used = [], [], 0
+    for partial in partials:
+        cost = estimate_tokens(partial)
+        if len(group) >= 2 and used + cost > budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(partial)
+        used += cost
+    if len(group) == 1 and groups:
+        groups[-1].append(group[0])
+    elif group:
+        groups.append(group)
+    return groups
+
+
+async def gather_or_cancel(*aws) -> list:
+    """
+    Like asyncio.gather, but the first failure cancels the calls still
+    running before it is raised, so none of them outlives the job.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def reduce_summaries(client, partials: list[str]) -> str:
+    """
+    Combine partial summaries, in stages when together they exceed the
+    prompt budget. Each combining call goes through the summary cache.
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+
+    async def combine(group: list[str]) -> str:
+        key = summary_cache_key(
+            [{"id": i, "summary": partial} for i, partial in enumerate(group)],
+            REDUCE_INSTRUCTION,
+        )
+        async with semaphore:
+            return await _cached(client, key, lambda: combine_summaries(group))
+
+    while len(partials) > 1:
+        groups = _pack_summaries(partials, PROMPT_TOKEN_BUDGET)
+        partials = await gather_or_cancel(*(combine(group) for group in groups))
+    return partials[0]
+
+
+async def map_reduce_summary(client, chunks: list[list[dict]]) -> str:
+    """
+    Summarise each chunk, at most SUMMARY_CHUNK_CONCURRENCY at a time, then
+    combine the partial summaries. Both steps go through the summary cache,
+    so a re-run only calls the agent for chunks that changed.
+    """
+    semaphore = asyncio.Semaphore(SUMMARY_CHUNK_CONCURRENCY)
+
+    async def summarise_chunk(chunk: list[dict]) -> str:
+        async with semaphore:
+            return await cached_summary(client, chunk, CHUNK_INSTRUCTION)
+
+    partials = await gather_or_cancel(*(summarise_chunk(chunk) for chunk in chunks))
+    return await reduce_summaries(client, list(partials))
+
 
+async def summarise(client, appointments: list[dict]) -> str:
+    chunks = split_into_chunks(appointments, SUMMARY_CHUNK_ROWS)
+    if len(chunks) <= 1:
+        return await cached_summary(client, appointments)
+    return await map_reduce_summary(client, chunks)
 
-async def generate_summary(appointments: list[dict]) -> str:
-    prompt = f"Generate a helpful summary for these appointments:\n{json.dumps(appointments, indent=2)}"
-    result = await agent.run(prompt)
-    return str(result.data)
 
+def _parse_date(value):
+    return dt.date.fromisoformat(value) if value else None
 
-async def process_job(client, raw) -> int:
+
+async def load_appointments(job: dict) -> tuple[list[dict], int]:
+    """
+    Read the appointments a job refers to from the database, chunk by chunk,
+    together with the change log sequence number they reflect. Both come
+    from one read transaction, so a summary of the rows can later be
+    updated with exactly the changes logged after that number.
+    """
+    filters = job.get("filters") or {}
+    appointments = []
+    async with AsyncSession(async_read_engine) as session:
+        repo = AsyncSQLiteAppointmentRepository(session)
+        seq = await repo.latest_seq()
+        async for rows in repo.iter_rows(
+            date_from=_parse_date(filters.get("date_from")),
+            date_to=_parse_date(filters.get("date_to")),
+            chunk_size=LOAD_CHUNK_SIZE,
+            one_transaction=True,
+        ):
+            appointments.extend(
+                {
+                    "id": appointment_id,
+                    "client_name": client_name,
+                    "date": date.isoformat(),
+                    "time": time.isoformat(),
+                    "notes": notes,
+                }
+                for appointment_id, client_name, date, time, notes in rows
+            )
+    return appointments, seq
+
+
+async def load_changes(after_seq: int, until_seq: int, limit: int) -> list[dict]:
+    """
+    Change log entries after ``after_seq``. Updates also carry the slot the
+    appointment had before (``old_date``/``old_time``) when it is known, so
+    a move can be told apart from a second booking.
+    """
+    async with AsyncSession(async_read_engine) as session:
+        repo = AsyncSQLiteAppointmentRepository(session)
+        changes = await repo.changes_since(after_seq, until_seq=until_seq, limit=limit)
+        ids = {change.appointment_id for change in changes}
+        previous = await repo.last_changes_before(ids, after_seq)
+
+    slots = {
+        appointment_id: (change.date, change.time)
+        for appointment_id, change in previous.items()
+    }
+    encoded = []
+    for change in changes:
+        entry = {
+            "seq": change.seq,
+            "op": change.op,
+            "appointment_id": change.appointment_id,
+            "client_name": change.client_name,
+            "date": change.date.isoformat(),
+            "time": change.time.isoformat(),
+            "notes": change.notes,
+        }
+        old = slots.get(change.appointment_id)
+        if change.op == "updated" and old is not None:
+            entry["old_date"], entry["old_time"] = (
+                old[0].isoformat(),
+                old[1].isoformat(),
+            )
+        slots[change.appointment_id] = (change.date, change.time)
+        encoded.append(entry)
+    return encoded
+
+
+def _state_key(job: dict) -> Optional[str]:
+    """Only unfiltered, database-backed jobs of a known user keep state."""
+    filters = job.get("filters") or {}
+    if job.get("seq") is None or not job.get("username") or any(filters.values()):
+        return None
+    return SUMMARY_STATE_PREFIX + job["username"]
+
+
+def _decode_hash(values: dict) -> dict:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (
+            v.decode() if isinstance(v, bytes) else v
+        )
+        for k, v in values.items()
+    }
+
+
+async def load_summary_state(client, job: dict) -> dict:
+    key = _state_key(job)
+    return _decode_hash(await client.hgetall(key)) if key else {}
+
+
+async def incremental_summary(client, job: dict, state: dict) -> Optional[str]:
+    """
+    Update the previous summary in ``state`` with the changes logged since
+    it was written, up to the job's sequence number. Returns None when a
+    full run is needed: no previous summary, too many changes, or too many
+    updates in a row, or the database was reset.
+    """
+    if (
+        not state
+        or INCREMENTAL_MAX_CHANGES <= 0
+        or int(state.get("runs", 0)) >= INCREMENTAL_MAX_RUNS
+    ):
+        return None
+
+    previous, since = state["summary"], int(state["seq"])
+    if since > job["seq"]:
+        # The log restarted below the summary's position: the database was
+        # reset, so the summary describes data that no longer exists
+        return None
+    if since == job["seq"]:
+        return previous
+    changes = await load_changes(since, job["seq"], INCREMENTAL_MAX_CHANGES + 1)
+    if len(changes) > INCREMENTAL_MAX_CHANGES:
+        return None
+
+    cache_key = summary_cache_key(
+        [{"id": 0, "previous": previous, "changes": changes}],
+        INCREMENTAL_INSTRUCTION,
+    )
+    return await _cached(client, cache_key, lambda: update_summary(previous, changes))
+
+
+async def save_summary_state(
+    client, job: dict, summary: str, runs: int, seq: int
+) -> None:
+    """Remember ``summary`` as reflecting the change log up to ``seq``."""
+    key = _state_key(job)
+    if key is None:
+        return
+    await client.hset(key, mapping={"seq": seq, "summary": summary, "runs": runs})
+    await client.expire(key, SUMMARY_CACHE_TTL)
+
+
+def _parse_job(raw) -> dict:
     if isinstance(raw, bytes):
         raw = raw.decode()
+    return json.loads(raw) if isinstance(raw, str) else raw
 
-    data = json.loads(raw)
-    appointments = data.get("appointments", [])
 
-    summary = await generate_summary(appointments)
-    await client.set(SUMMARY_RESULT_KEY, summary)
-    return len(appointments)
+def _utcnow() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
 
 
-async def worker_loop():
-    client = await redis.from_url(REDIS_URL)
-    print("Worker started. Waiting for jobs...")
+async def update_job_status(client, job: dict, status: str, **fields) -> None:
+    """Record a job's state in its status hash. Legacy jobs have no id."""
+    job_id = job.get("job_id")
+    if not job_id:
+        return
+    key = SUMMARY_JOB_PREFIX + job_id
+    await client.hset(key, mapping={"status": status, **fields})
+    await client.expire(key, SUMMARY_JOB_TTL)
 
-    while True:
+
+async def take_duplicates(client, job: dict) -> list[dict]:
+    """
+    Remove the queued jobs with the same fingerprint as ``job`` and return
+    them; they are answered by the same run. A duplicate another worker
+    removed first is left to that worker.
+    """
+    fingerprint = job.get("fingerprint")
+    if not fingerprint:
+        return []
+
+    # Only the jobs due next: scanning the whole queue for every job would
+    # cost quadratic time in a long queue
+    duplicates = []
+    for raw in await client.lrange(QUEUE, 0, COALESCE_SCAN - 1):
         try:
-            job = await client.blpop(QUEUE, timeout=5)
+            other = _parse_job(raw)
+        except ValueError:
+            continue
+        if other.get("fingerprint") == fingerprint and await client.lrem(QUEUE, 1, raw):
+            duplicates.append(other)
+
+    if duplicates:
+        await client.hincrby(SUMMARY_METRICS_KEY, "coalesced_in_queue", len(duplicates))
+    return duplicates
+
+
+async def release_pending(client, fingerprint: str, jobs: list[dict]) -> None:
+    """
+    Clear the pending marker if it points at one of ``jobs``. Once it expired
+    or was taken over it belongs to a newer queued job and must stay.
+    """
+    key = SUMMARY_PENDING_PREFIX + fingerprint
+    job_ids = {job.get("job_id") for job in jobs}
+    async with client.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(key)
+            owner = await pipe.get(key)
+            if isinstance(owner, bytes):
+                owner = owner.decode()
+            if owner is None or owner not in job_ids:
+                return
+            pipe.multi()
+            pipe.delete(key)
+            await pipe.execute()
+        except WatchError:
+            # Taken over between the read and the delete
+            pass
+
+
+async def process_job(client, raw, duplicates: list[dict] = ()) -> int:
+    data = _parse_job(raw)
+    jobs = [data, *duplicates]
+    if data.get("fingerprint"):
+        # From here on the data may change under the job, so new requests
+        # must queue a job of their own
+        await release_pending(client, data["fingerprint"], jobs)
+    for job in jobs:
+        await update_job_status(client, job, "running", started_at=_utcnow())
+
+    state = await load_summary_state(client, data)
+    summary = await incremental_summary(client, data, state)
 
-            if job is None:
-                continue
+    seq = data.get("seq")
+    if summary is not None:
+        count = data.get("count", 0)
+        runs = int(state.get("runs", 0)) + 1
+        await client.hincrby(SUMMARY_METRICS_KEY, "incremental_runs", 1)
+    else:
+        if "appointments" in data:
+            # Jobs queued before jobs referenced the database carry their rows
+            appointments = data["appointments"]
+        else:
+            # The rows as they are now, not when the job was queued
+            appointments, seq = await load_appointments(data)
+        summary = await summarise(client, appointments)
+        count = len(appointments)
+        runs = 0
+        await client.hincrby(SUMMARY_METRICS_KEY, "full_runs", 1)
+    await save_summary_state(client, data, summary, runs, seq)
 
-            _, raw = job
-            count = await process_job(client, raw)
-            print(f"Summary generated for {count} appointments")
+    # Each user has their own latest result; jobs queued without a user
+    # still write the shared key
+    username = data.get("username")
+    result_key = f"{SUMMARY_RESULT_KEY}:{username}" if username else SUMMARY_RESULT_KEY
+    await client.set(result_key, summary)
+    for job in jobs:
+        await update_job_status(
+            client,
+            job,
+            "done",
+            finished_at=_utcnow(),
+            count=count,
+            summary=summary,
+        )
+    return count
 
+
+def make_queue(client, transport: str = SUMMARY_TRANSPORT):
+    if transport == "stream":
+        return StreamQueue(
+            client,
+            STREAM,
+            STREAM_GROUP,
+            CONSUMER_NAME,
+            dead_letter_stream=DEAD_LETTER_STREAM,
+            max_deliveries=MAX_DELIVERIES,
+            claim_idle_ms=CLAIM_IDLE_MS,
+        )
+    return ListQueue(client, QUEUE)
+
+
+async def run_job(client, queue, delivery: tuple, semaphore: asyncio.Semaphore):
+    raw, entry_id, deliveries = delivery
+    jobs = []
+    try:
+        job = _parse_job(raw)
+        jobs = [job]
+        if deliveries > queue.max_deliveries:
+            # Its last attempt never finished, e.g. the worker crashed on it
+            error = f"Gave up after {deliveries - 1} deliveries"
+            await queue.dead_letter(delivery, error)
+            await _mark_failed(client, jobs, error)
+            return
+
+        duplicates = await take_duplicates(client, job) if queue.coalesce else []
+        jobs.extend(duplicates)
+        count = await asyncio.wait_for(
+            process_job(client, job, duplicates), JOB_TIMEOUT
+        )
+        await queue.ack(entry_id)
+        print(f"Summary generated for {count} appointments")
+    except CircuitOpenError as e:
+        print(f"Requeueing job: {e}")
+        await _requeue(client, queue, delivery, jobs)
+    except asyncio.TimeoutError:
+        print(f"Job timed out after {JOB_TIMEOUT}s")
+        # A slow provider is a failing one, but one job is one failure
+        breaker.record_failure()
+        await _job_failed(
+            client, queue, delivery, jobs, f"Timed out after {JOB_TIMEOUT}s"
+        )
+    except Exception as e:
+        print(f"Error processing job: {e}")
+        await _job_failed(client, queue, delivery, jobs, str(e))
+    finally:
+        await _publish_breaker_state(client)
+        semaphore.release()
+
+
+async def _requeue(client, queue, delivery: tuple, jobs: list[dict]) -> None:
+    try:
+        await queue.requeue(delivery)
+        # Coalesced duplicates were taken off the queue with the job
+        for job in jobs[1:]:
+            await queue.requeue((json.dumps(job), None, 1))
+        for job in jobs:
+            await update_job_status(client, job, "queued")
+        await client.hincrby(SUMMARY_METRICS_KEY, "requeued", len(jobs))
+    except Exception as e:
+        print(f"Error requeueing job: {e}")
+
+
+_published_breaker_state = None
+
+
+async def _publish_breaker_state(client) -> None:
+    """Mirror the breaker into summary_metrics whenever it changes."""
+    global _published_breaker_state
+    state = (breaker.state, breaker.times_opened)
+    if state == _published_breaker_state:
+        return
+    try:
+        await client.hset(
+            SUMMARY_METRICS_KEY,
+            mapping={"breaker_state": state[0], "breaker_opened": state[1]},
+        )
+        _published_breaker_state = state
+    except Exception as e:
+        print(f"Error publishing breaker state: {e}")
+
+
+async def _wait(stop_event: asyncio.Event, seconds: float) -> None:
+    """Sleep for ``seconds``, waking early when the worker is stopping."""
+    try:
+        await asyncio.wait_for(stop_event.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _job_failed(client, queue, delivery: tuple, jobs: list[dict], error: str):
+    try:
+        if await queue.retry(delivery, error):
+            for job in jobs:
+                await update_job_status(client, job, "queued", error=error)
+            return
+    except Exception as e:
+        print(f"Error handing back failed job: {e}")
+    await _mark_failed(client, jobs, error)
+
+
+async def _mark_failed(client, jobs: list[dict], error: str) -> None:
+    try:
+        for job in jobs:
+            await update_job_status(
+                client, job, "failed", finished_at=_utcnow(), error=error
+            )
+    except Exception as e:
+        print(f"Error recording job failure: {e}")
+
+
+async def worker_loop(
+    client=None,
+    concurrency: int = WORKER_CONCURRENCY,
+    stop_event: Optional[asyncio.Event] = None,
+    queue=None,
+):
+    """
+    Run up to ``concurrency`` jobs at once. A job is only fetched when a slot
+    is free, so waiting jobs stay in Redis, and no job is fetched while the
+    circuit breaker is open. Once ``stop_event`` is set no new jobs are taken
+    and the loop returns after in-flight jobs finish.
+    """
+    if client is None:
+        client = await redis.from_url(REDIS_URL)
+    if stop_event is None:
+        stop_event = asyncio.Event()
+    if queue is None:
+        queue = make_queue(client)
+    await queue.setup()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task] = set()
+    print(f"Worker started (concurrency={concurrency}). Waiting for jobs...")
+
+    fetch_failures = 0
+    while not stop_event.is_set():
+        # Jobs would only be requeued while the provider is considered down
+        pause = breaker.retry_after()
+        if pause > 0:
+            await _publish_breaker_state(client)
+            await _wait(stop_event, pause)
+            continue
+
+        await semaphore.acquire()
+        if stop_event.is_set():
+            semaphore.release()
+            break
+
+        try:
+            delivery = await queue.fetch(timeout=1)
         except Exception as e:
-            print(f"Error processing job: {e}")
-            await asyncio.sleep(5)
+            semaphore.release()
+            delay = backoff_delay(fetch_failures, RETRY_BASE_DELAY, FETCH_MAX_DELAY)
+            fetch_failures += 1
+            print(f"Error fetching job: {e} (retrying in {delay:.1f}s)")
+            await _wait(stop_event, delay)
+            continue
+        fetch_failures = 0
+
+        if delivery is None:
+            semaphore.release()
+            continue
+
+        task = asyncio.create_task(run_job(client, queue, delivery, semaphore))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        print(f"Draining {len(in_flight)} in-flight jobs...")
+        await asyncio.gather(*in_flight)
+    print("Worker stopped.")
+
+
+async def main():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    await worker_loop(stop_event=stop_event)
 
 
 if __name__ == "__main__":
-    asyncio.run(worker_loop())
+    asyncio.run(main())
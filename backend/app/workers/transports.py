@@ -0,0 +1,185 @@
+"""
+Job transports for the summary worker.
+
+``ListQueue`` is the original LPUSH/BLPOP list: simple, but a job popped by a
+worker that then dies is lost. ``StreamQueue`` reads a Redis stream through
+a consumer group instead. An entry is acknowledged only once its job has
+finished, entries left pending by a crashed worker are reclaimed by the
+others, and entries that keep failing go to a dead-letter stream. That gives
+at-least-once processing across any number of worker replicas.
+
+``fetch`` returns a delivery ``(raw_job, entry_id, deliveries)`` or None.
+"""
+
+import time
+from typing import Optional
+
+from redis.exceptions import ResponseError
+
+DEAD_LETTER_MAXLEN = 10_000
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ListQueue:
+    # Queued duplicates can be found and removed with LRANGE/LREM
+    coalesce = True
+    max_deliveries = 1
+
+    def __init__(self, client, key: str):
+        self.client = client
+        self.key = key
+
+    async def setup(self) -> None:
+        pass
+
+    async def fetch(self, timeout: int = 1) -> Optional[tuple]:
+        job = await self.client.blpop(self.key, timeout=timeout)
+        return None if job is None else (job[1], None, 1)
+
+    async def ack(self, entry_id) -> None:
+        pass
+
+    async def requeue(self, delivery: tuple) -> None:
+        # To the far end, behind the jobs already waiting
+        await self.client.rpush(self.key, delivery[0])
+
+    async def retry(self, delivery: tuple, error: str) -> bool:
+        # A popped job is gone from the list: there is nothing to retry
+        return False
+
+    async def dead_letter(self, delivery: tuple, error: str) -> None:
+        pass
+
+
+class StreamQueue:
+    coalesce = False
+
+    def __init__(
+        self,
+        client,
+        stream: str,
+        group: str,
+        consumer: str,
+        *,
+        dead_letter_stream: str,
+        max_deliveries: int,
+        claim_idle_ms: int,
+        claim_interval: float = 5.0,
+    ):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.dead_letter_stream = dead_letter_stream
+        self.max_deliveries = max_deliveries
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self._claim_cursor = "0-0"
+        self._next_claim = 0.0
+
+    async def setup(self) -> None:
+        try:
+            await self.client.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def fetch(self, timeout: int = 1) -> Optional[tuple]:
+        delivery = await self._claim()
+        if delivery is not None:
+            return delivery
+
+        response = await self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=1,
+            block=int(timeout * 1000),
+        )
+        if not response:
+            return None
+        entry_id, fields = response[0][1][0]
+        return self._job(fields), _text(entry_id), 1
+
+    async def _claim(self) -> Optional[tuple]:
+        """
+        Take over one entry that another consumer has held for longer than
+        ``claim_idle_ms``: it crashed, or its job failed and is due a retry.
+        Once a pass over the pending list finds nothing, the next pass waits
+        ``claim_interval`` seconds.
+        """
+        if time.monotonic() < self._next_claim:
+            return None
+
+        response = await self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=1,
+        )
+        self._claim_cursor = _text(response[0])
+        # Entries deleted from the stream come back without fields (Redis 6)
+        entries = [(i, fields) for i, fields in response[1] if fields]
+        if not entries:
+            if self._claim_cursor == "0-0":
+                self._next_claim = time.monotonic() + self.claim_interval
+            return None
+
+        entry_id, fields = entries[0]
+        entry_id = _text(entry_id)
+        pending = await self.client.xpending_range(
+            self.stream, self.group, min=entry_id, max=entry_id, count=1
+        )
+        deliveries = pending[0]["times_delivered"] if pending else 1
+        return self._job(fields), entry_id, deliveries
+
+    @staticmethod
+    def _job(fields: dict) -> str:
+        return _text(fields.get(b"job", fields.get("job")))
+
+    async def ack(self, entry_id: str) -> None:
+        # Deleting as well keeps the stream down to unfinished entries
+        await self.client.xack(self.stream, self.group, entry_id)
+        await self.client.xdel(self.stream, entry_id)
+
+    async def requeue(self, delivery: tuple) -> None:
+        """
+        Add the job again as a new entry, so waiting for the provider does
+        not use up its deliveries.
+        """
+        raw, entry_id, _ = delivery
+        await self.client.xadd(self.stream, {"job": raw})
+        if entry_id is not None:
+            await self.ack(entry_id)
+
+    async def retry(self, delivery: tuple, error: str) -> bool:
+        """
+        Leave a failed entry pending so it is reclaimed and run again, unless
+        it has used up its deliveries, in which case it is dead-lettered.
+        """
+        if delivery[2] < self.max_deliveries:
+            return True
+        await self.dead_letter(delivery, error)
+        return False
+
+    async def dead_letter(self, delivery: tuple, error: str) -> None:
+        raw, entry_id, deliveries = delivery
+        await self.client.xadd(
+            self.dead_letter_stream,
+            {
+                "job": raw,
+                "entry_id": entry_id,
+                "deliveries": deliveries,
+                "error": error,
+            },
+            maxlen=DEAD_LETTER_MAXLEN,
+            approximate=True,
+        )
+        await self.ack(entry_id)
@@ -0,0 +1,67 @@
+"""
+Measure login throughput (bcrypt verifications per second) at several
+bcrypt costs, running inline on one thread versus on the process pool
+used by the API.
+
+    python -m backend.scripts.bench_password_hashing --costs 8 10 12
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+PASSWORD = "correct horse battery staple"
+
+
+def _verify(rounds: int, hashed: str) -> bool:
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).verify(
+        PASSWORD, hashed
+    )
+
+
+async def _pool_rate(pool, rounds: int, hashed: str, logins: int) -> float:
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(loop.run_in_executor(pool, _verify, rounds, hashed) for _ in range(logins))
+    )
+    return logins / (time.perf_counter() - start)
+
+
+def _inline_rate(rounds: int, hashed: str, logins: int) -> float:
+    start = time.perf_counter()
+    for _ in range(logins):
+        _verify(rounds, hashed)
+    return logins / (time.perf_counter() - start)
+
+
+def run(costs: list[int], logins: int, workers: int) -> None:
+    print(f"{'cost':>4} {'inline/s':>10} {'pool/s':>10}  ({workers} workers)")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        # Warm the workers so process start-up is not measured
+        for future in [pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+        for rounds in costs:
+            hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(
+                PASSWORD
+            )
+            inline = _inline_rate(rounds, hashed, max(1, logins // 4))
+            pooled = asyncio.run(_pool_rate(pool, rounds, hashed, logins))
+            print(f"{rounds:>4} {inline:>10.1f} {pooled:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--costs", type=int, nargs="+", default=[4, 8, 10, 12])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+    run(args.costs, args.logins, args.workers)
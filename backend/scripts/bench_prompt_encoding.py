@@ -0,0 +1,59 @@
+"""
+Report prompt size (bytes and estimated tokens) of indented JSON versus the
+compact encoding used by the summary worker, on a synthetic appointment set.
+
+    python -m backend.scripts.bench_prompt_encoding --appointments 10000
+"""
+
+import argparse
+import datetime as dt
+import json
+import random
+
+from backend.app.workers.prompt_encoding import encode_appointments, estimate_tokens
+
+CLIENTS = ["Alice Cohen", "Ben Levi", "Dana Mizrahi", "Omer Katz", "Noa Friedman"]
+NOTES = ["", "", "", "First visit", "Follow-up", "Bring previous results"]
+
+
+def synthetic_appointments(count: int, seed: int = 0) -> list[dict]:
+    """Appointments on 30-minute slots from 08:00, across consecutive days."""
+    rng = random.Random(seed)
+    start = dt.date(2025, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "client_name": rng.choice(CLIENTS),
+            "date": (start + dt.timedelta(days=i // 20)).isoformat(),
+            "time": dt.time(8 + (i % 20) // 2, 30 * (i % 2)).isoformat(),
+            "notes": rng.choice(NOTES) or None,
+        }
+        for i in range(count)
+    ]
+
+
+def measure(appointments: list[dict]) -> dict:
+    encodings = {
+        "json": json.dumps(appointments, indent=2),
+        "compact": encode_appointments(appointments),
+    }
+    return {
+        name: {"bytes": len(text.encode()), "tokens": estimate_tokens(text)}
+        for name, text in encodings.items()
+    }
+
+
+def run(count: int) -> None:
+    sizes = measure(synthetic_appointments(count))
+    print(f"{'encoding':>8} {'bytes':>10} {'tokens':>10}  ({count} appointments)")
+    for name, size in sizes.items():
+        print(f"{name:>8} {size['bytes']:>10} {size['tokens']:>10}")
+    for unit in ("bytes", "tokens"):
+        ratio = sizes["json"][unit] / sizes["compact"][unit]
+        print(f"{unit} reduction: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appointments", type=int, default=10000)
+    run(parser.parse_args().appointments)
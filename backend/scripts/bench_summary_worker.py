@@ -0,0 +1,98 @@
+"""
+Measure summary worker throughput (jobs/sec) at several concurrency levels
+against an in-memory queue and a fake agent with fixed latency.
+
+    python -m backend.scripts.bench_summary_worker --latency 0.2 --jobs 40
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+import types
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+
+from backend.app.workers import summary_worker  # noqa: E402
+
+
+class FakeAgent:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def run(self, prompt: str):
+        await asyncio.sleep(self.latency)
+        return types.SimpleNamespace(data="summary")
+
+
+class InMemoryQueue:
+    def __init__(self, jobs: list[str]):
+        self.jobs = jobs
+        self.results = 0
+
+    async def blpop(self, key: str, timeout: int = 0):
+        if not self.jobs:
+            await asyncio.sleep(0.001)
+            return None
+        return key, self.jobs.pop()
+
+    async def set(self, key: str, value: str, ex=None):
+        if key == summary_worker.SUMMARY_RESULT_KEY:
+            self.results += 1
+
+    # Summary cache calls: every lookup misses so each job reaches the agent
+    async def get(self, key: str):
+        return None
+
+    async def hincrby(self, key: str, field: str, amount: int = 1):
+        pass
+
+    async def zadd(self, key: str, mapping: dict):
+        pass
+
+    async def zcard(self, key: str):
+        return 0
+
+
+async def _measure(concurrency: int, jobs: int) -> float:
+    queue = InMemoryQueue(
+        [
+            json.dumps({"appointments": [{"id": i, "client_name": "A"}]})
+            for i in range(jobs)
+        ]
+    )
+    stop_event = asyncio.Event()
+
+    start = time.perf_counter()
+    loop_task = asyncio.create_task(
+        summary_worker.worker_loop(queue, concurrency, stop_event)
+    )
+    while queue.results < jobs:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    stop_event.set()
+    await loop_task
+    return jobs / elapsed
+
+
+def run(concurrency_levels: list[int], jobs: int, latency: float) -> None:
+    summary_worker.agent = FakeAgent(latency)
+    # Keep the worker's per-job log lines out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {n: asyncio.run(_measure(n, jobs)) for n in concurrency_levels}
+
+    print(f"{'concurrency':>11} {'jobs/s':>8}  (agent latency {latency}s)")
+    for concurrency, rate in results.items():
+        print(f"{concurrency:>11} {rate:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.concurrency, args.jobs, args.latency)
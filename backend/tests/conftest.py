@@ -2,13 +2,24 @@ import os
 
 os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key")
 os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+# Cheap hashes keep the auth tests fast
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from backend.app.core.deps import token_cache, user_cache
 from backend.app.main import app
-from backend.app.database import get_session
+from backend.app.routes.appointments import appointment_cache
+from backend.app.database import (
+    get_async_read_session,
+    get_async_session,
+    get_session,
+)
 
 
 TEST_DB = "appointments_test.db"
@@ -37,16 +48,38 @@ def session():
             pass
 
 
+@pytest.fixture
+def async_engine(session):
+    # TestClient runs every request on a fresh event loop, so async
+    # connections must not be pooled across requests.
+    return create_async_engine(f"sqlite+aiosqlite:///{TEST_DB}", poolclass=NullPool)
+
+
 @pytest.fixture(autouse=True)
-def override_session(session):
+def override_session(session, async_engine):
     def override():
         yield session
 
+    async def override_async():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
     app.dependency_overrides[get_session] = override
+    app.dependency_overrides[get_async_session] = override_async
+    app.dependency_overrides[get_async_read_session] = override_async
     yield
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    # Every test starts from an empty database, so cached state must go too
+    user_cache.clear()
+    token_cache.clear()
+    appointment_cache.clear()
+    yield
+
+
 @pytest.fixture
 def client():
     return TestClient(app)
@@ -1,3 +1,14 @@
+import datetime as dt
+
+from backend.app.models import AppointmentCreate, AppointmentUpdate
+from backend.app.repository_sqlite import (
+    AsyncSQLiteAppointmentRepository,
+    SQLiteAppointmentRepository,
+    _list_statement,
+)
+from backend.app.routes import appointments as appointment_routes
+
+
 def test_create_appointment(client, auth_headers):
     response = client.post(
         "/appointments/",
@@ -172,3 +183,479 @@ def test_export_appointments_csv(client, auth_headers):
     body = response.text.splitlines()
     assert body[0] == "id,client_name,date,time,notes"
     assert "Test User" in body[1]
+
+
+def _create(client, auth_headers, client_name, date, time):
+    response = client.post(
+        "/appointments/",
+        json={"client_name": client_name, "date": date, "time": time},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_list_appointments_paginates_with_cursor(client, auth_headers):
+    for hour in range(10, 15):
+        _create(client, auth_headers, "Client", "2025-01-01", f"{hour}:00")
+
+    response = client.get("/appointments/?limit=2", headers=auth_headers)
+    assert response.status_code == 200
+    assert [a["id"] for a in response.json()] == [1, 2]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        f"/appointments/?limit=2&cursor={cursor}", headers=auth_headers
+    )
+    assert [a["id"] for a in response.json()] == [3, 4]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        f"/appointments/?limit=2&cursor={cursor}", headers=auth_headers
+    )
+    assert [a["id"] for a in response.json()] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_appointments_filters(client, auth_headers):
+    _create(client, auth_headers, "Alice Smith", "2025-01-01", "09:00")
+    _create(client, auth_headers, "Bob Jones", "2025-01-02", "09:00")
+    _create(client, auth_headers, "Alice Brown", "2025-01-03", "09:00")
+
+    response = client.get(
+        "/appointments/?date_from=2025-01-02&date_to=2025-01-03",
+        headers=auth_headers,
+    )
+    assert [a["id"] for a in response.json()] == [2, 3]
+
+    response = client.get("/appointments/?client_name=alice", headers=auth_headers)
+    assert [a["client_name"] for a in response.json()] == [
+        "Alice Smith",
+        "Alice Brown",
+    ]
+
+
+def test_list_appointments_pages_date_ranges_by_slot(client, auth_headers):
+    # Created out of slot order, so id and slot order differ
+    for date, time in [
+        ("2025-01-03", "09:00"),
+        ("2025-01-02", "10:00"),
+        ("2025-01-02", "09:00"),
+        ("2025-01-01", "09:00"),
+        ("2025-01-04", "09:00"),
+    ]:
+        _create(client, auth_headers, "Client", date, time)
+
+    ids, cursor = [], None
+    while True:
+        params = {"date_from": "2025-01-02", "date_to": "2025-01-03", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/appointments/", params=params, headers=auth_headers)
+        ids.extend(a["id"] for a in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert ids == [3, 2, 1]
+
+
+def test_date_range_pages_use_the_slot_index_without_sorting(session):
+    stmt = _list_statement(
+        101,
+        None,
+        dt.date(2025, 1, 1),
+        dt.date(2025, 2, 1),
+        None,
+        (dt.date(2025, 1, 5), dt.time(9), 3),
+    )
+    sql = str(stmt.compile(session.get_bind(), compile_kwargs={"literal_binds": True}))
+
+    plan = " ".join(
+        row[-1]
+        for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    )
+
+    assert "ix_appointment_slot" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_date_range_pages_keep_legacy_double_bookings(client, auth_headers, session):
+    # A migrated database with double bookings keeps a non-unique slot index
+    connection = session.connection()
+    connection.exec_driver_sql("DROP INDEX ix_appointment_slot")
+    connection.exec_driver_sql(
+        "CREATE INDEX ix_appointment_slot ON appointment (date, time)"
+    )
+    for name, time in [("A", "09:00"), ("B", "10:00"), ("C", "10:00"), ("D", "11:00")]:
+        connection.exec_driver_sql(
+            "INSERT INTO appointment (client_name, date, time) "
+            f"VALUES ('{name}', '2025-01-05', '{time}:00.000000')"
+        )
+    session.commit()
+
+    names, cursor = [], None
+    while True:
+        params = {"date_from": "2025-01-05", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/appointments/", params=params, headers=auth_headers)
+        names.extend(a["client_name"] for a in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert names == ["A", "B", "C", "D"]
+
+
+def test_list_appointments_rejects_bad_cursor(client, auth_headers):
+    response = client.get("/appointments/?cursor=not-a-cursor", headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_create_appointment_rejects_invalid_date(client, auth_headers):
+    response = client.post(
+        "/appointments/",
+        json={"client_name": "Test User", "date": "tomorrow", "time": "12:00"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+
+def test_update_appointment_into_taken_slot_conflicts(client, auth_headers):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+    _create(client, auth_headers, "User Two", "2025-01-01", "13:00")
+
+    response = client.put(
+        "/appointments/2", json={"time": "12:00"}, headers=auth_headers
+    )
+    assert response.status_code == 409
+
+
+def test_repository_list_between(session):
+    repo = SQLiteAppointmentRepository(session)
+    for date, time in [
+        ("2025-01-05", "18:00"),
+        ("2025-01-06", "09:00"),
+        ("2025-01-06", "08:00"),
+        ("2025-01-13", "09:00"),
+    ]:
+        repo.create(AppointmentCreate(client_name="C", date=date, time=time))
+
+    week = repo.list_between(dt.datetime(2025, 1, 6), dt.datetime(2025, 1, 13))
+    assert [(str(a.date), str(a.time)) for a in week] == [
+        ("2025-01-06", "08:00:00"),
+        ("2025-01-06", "09:00:00"),
+    ]
+
+
+def test_repository_logs_changes_in_order(session):
+    repo = SQLiteAppointmentRepository(session)
+    first = repo.create(
+        AppointmentCreate(client_name="A", date="2025-01-01", time="09:00")
+    )
+    repo.create_many(
+        [
+            AppointmentCreate(client_name="B", date="2025-01-02", time="09:00"),
+            AppointmentCreate(client_name="C", date="2025-01-03", time="09:00"),
+        ]
+    )
+    repo.update(first.id, AppointmentUpdate(notes="moved"))
+    repo.delete(2)
+
+    changes = repo.changes_since(0)
+    assert [(c.seq, c.op, c.appointment_id) for c in changes] == [
+        (1, "created", 1),
+        (2, "created", 2),
+        (3, "created", 3),
+        (4, "updated", 1),
+        (5, "deleted", 2),
+    ]
+    assert changes[3].notes == "moved"
+    assert changes[4].client_name == "B"
+    assert [c.seq for c in repo.changes_since(3, until_seq=4)] == [4]
+    assert repo.latest_seq() == 5
+
+
+def test_failed_write_logs_no_change(client, auth_headers, session):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+    _create(client, auth_headers, "User Two", "2025-01-01", "13:00")
+    response = client.put(
+        "/appointments/2", json={"time": "12:00"}, headers=auth_headers
+    )
+
+    assert response.status_code == 409
+
+    assert SQLiteAppointmentRepository(session).latest_seq() == 2
+
+
+def test_export_appointments_streams_in_chunks(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(appointment_routes, "EXPORT_CHUNK_SIZE", 2)
+    for day in range(1, 6):
+        _create(client, auth_headers, f"Client {day}", f"2025-01-0{day}", "09:00")
+
+    response = client.get(
+        "/appointments/export?date_from=2025-01-02&date_to=2025-01-04",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    body = response.text.splitlines()
+    assert body[0] == "id,client_name,date,time,notes"
+    assert [line.split(",")[1] for line in body[1:]] == [
+        "Client 2",
+        "Client 3",
+        "Client 4",
+    ]
+
+
+def test_export_appointments_empty(client, auth_headers):
+    response = client.get("/appointments/export", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["id,client_name,date,time,notes"]
+
+
+def test_bulk_create_reports_per_row_results(client, auth_headers):
+    _create(client, auth_headers, "Existing", "2025-01-01", "09:00")
+
+    response = client.post(
+        "/appointments/bulk",
+        json=[
+            {"client_name": "New", "date": "2025-01-01", "time": "10:00"},
+            {"client_name": "Taken", "date": "2025-01-01", "time": "09:00"},
+            {"client_name": "Bad", "date": "not-a-date", "time": "10:00"},
+            {"client_name": "Twin", "date": "2025-01-01", "time": "10:00"},
+            {"client_name": "Other", "date": "2025-01-02", "time": "10:00"},
+        ],
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["conflicts"], data["invalid"]) == (2, 2, 1)
+    assert [r["status"] for r in data["results"]] == [
+        "created",
+        "conflict",
+        "invalid",
+        "conflict",
+        "created",
+    ]
+    assert [r["id"] for r in data["results"] if r["id"]] == [2, 3]
+
+    response = client.get("/appointments/", headers=auth_headers)
+    assert len(response.json()) == 3
+
+
+def test_import_appointments_csv_round_trip(client, auth_headers):
+    csv_body = (
+        "id,client_name,date,time,notes\n"
+        "7,Alice,2025-02-01,09:00,first\n"
+        "8,Bob,2025-02-01,09:30,\n"
+    )
+    response = client.post(
+        "/appointments/import",
+        files={"file": ("appointments.csv", csv_body, "text/csv")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+    response = client.get("/appointments/2", headers=auth_headers)
+    assert response.json()["client_name"] == "Bob"
+    assert response.json()["notes"] is None
+
+
+def test_reads_answer_not_modified_until_a_write(client, auth_headers):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+
+    for url in ["/appointments/", "/appointments/1", "/appointments/export"]:
+        first = client.get(url, headers=auth_headers)
+        etag = first.headers["ETag"]
+        cached = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+    _create(client, auth_headers, "User Two", "2025-01-01", "13:00")
+    response = client.get(
+        "/appointments/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_matches_lists_and_weak_tags():
+    etag = appointment_routes.make_etag(3)
+
+    assert appointment_routes.etag_matches(f'"x", W/{etag}', etag)
+    assert appointment_routes.etag_matches("*", etag)
+    assert not appointment_routes.etag_matches(appointment_routes.make_etag(2), etag)
+    assert not appointment_routes.etag_matches(None, etag)
+
+
+def test_reads_are_cached_until_a_write_touches_them(client, auth_headers, monkeypatch):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+    _create(client, auth_headers, "User Two", "2025-01-01", "13:00")
+    client.get("/appointments/", headers=auth_headers)
+    client.get("/appointments/1", headers=auth_headers)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("read reached the database")
+
+    monkeypatch.setattr(AsyncSQLiteAppointmentRepository, "list", fail)
+    monkeypatch.setattr(AsyncSQLiteAppointmentRepository, "get", fail)
+    assert len(client.get("/appointments/", headers=auth_headers).json()) == 2
+    assert client.get("/appointments/1", headers=auth_headers).json()["id"] == 1
+    monkeypatch.undo()
+
+    client.put("/appointments/2", json={"notes": "moved"}, headers=auth_headers)
+    # Only the list and the updated appointment are read again
+    monkeypatch.setattr(AsyncSQLiteAppointmentRepository, "get", fail)
+    assert client.get("/appointments/1", headers=auth_headers).status_code == 200
+    monkeypatch.undo()
+    response = client.get("/appointments/2", headers=auth_headers)
+    assert response.json()["notes"] == "moved"
+    rows = client.get("/appointments/", headers=auth_headers).json()
+    assert rows[1]["notes"] == "moved"
+
+    stats = appointment_routes.appointment_cache.stats()
+    assert stats["hits"] >= 3
+    assert stats["backend"] == "memory"
+
+
+def test_reads_see_writes_from_other_processes_without_redis(
+    client, auth_headers, session
+):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+    first = client.get("/appointments/", headers=auth_headers)
+    item = client.get("/appointments/1", headers=auth_headers)
+
+    # Written by another process: this one's cache generations are not bumped
+    repo = SQLiteAppointmentRepository(session)
+    repo.create(
+        AppointmentCreate(client_name="User Two", date="2025-01-01", time="13:00")
+    )
+    repo.update(1, AppointmentUpdate(notes="moved"))
+
+    response = client.get(
+        "/appointments/",
+        headers={**auth_headers, "If-None-Match": first.headers["ETag"]},
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["X-Change-Seq"] == "3"
+    response = client.get(
+        "/appointments/changes", params={"since": 1}, headers=auth_headers
+    )
+    assert [c["client_name"] for c in response.json()["changes"]] == [
+        "User Two",
+        "User One",
+    ]
+
+    response = client.get(
+        "/appointments/1",
+        headers={**auth_headers, "If-None-Match": item.headers["ETag"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["notes"] == "moved"
+    assert response.headers["ETag"] == appointment_routes.make_etag(3)
+
+
+def test_changes_since_lets_clients_catch_up(client, auth_headers):
+    _create(client, auth_headers, "User One", "2025-01-01", "12:00")
+    response = client.get("/appointments/", headers=auth_headers)
+    since = int(response.headers["X-Change-Seq"])
+    assert since == 1
+
+    _create(client, auth_headers, "User Two", "2025-01-01", "13:00")
+    client.put("/appointments/1", json={"notes": "moved"}, headers=auth_headers)
+    client.delete("/appointments/2", headers=auth_headers)
+
+    response = client.get(
+        "/appointments/changes",
+        params={"since": since, "limit": 2},
+        headers=auth_headers,
+    )
+    page = response.json()
+    assert page["latest_seq"] == 4
+    assert page["has_more"] is True
+    assert [(c["seq"], c["op"], c["appointment_id"]) for c in page["changes"]] == [
+        (2, "created", 2),
+        (3, "updated", 1),
+    ]
+    assert page["changes"][1]["notes"] == "moved"
+
+    response = client.get(
+        "/appointments/changes", params={"since": 3}, headers=auth_headers
+    )
+    assert [c["op"] for c in response.json()["changes"]] == ["deleted"]
+
+    response = client.get(
+        "/appointments/changes", params={"since": 4}, headers=auth_headers
+    )
+    assert response.json() == {"latest_seq": 4, "has_more": False, "changes": []}
+
+
+def test_stats_aggregates_counts(client, auth_headers):
+    _create(client, auth_headers, "Ann", "2025-01-01", "09:00")
+    _create(client, auth_headers, "Ann", "2025-01-01", "10:00")
+    _create(client, auth_headers, "Bob", "2025-01-02", "09:00")
+    _create(client, auth_headers, "Cid", "2025-01-03", "09:00")
+
+    response = client.get(
+        "/appointments/stats",
+        params={"today": "2025-01-01", "top_clients": 2},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "total": 4,
+        "today": 2,
+        "per_day": [
+            {"date": "2025-01-01", "count": 2},
+            {"date": "2025-01-02", "count": 1},
+            {"date": "2025-01-03", "count": 1},
+        ],
+        "per_client": [
+            {"client_name": "Ann", "count": 2},
+            {"client_name": "Bob", "count": 1},
+        ],
+    }
+
+    response = client.get(
+        "/appointments/stats",
+        params={"date_from": "2025-01-02", "today": "2025-01-01"},
+        headers=auth_headers,
+    )
+    stats = response.json()
+    assert stats["total"] == 2
+    assert stats["today"] == 2
+    assert [day["date"] for day in stats["per_day"]] == ["2025-01-02", "2025-01-03"]
+
+    # A new day invalidates the tag even without a write
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/appointments/stats",
+        params={"date_from": "2025-01-02", "today": "2025-01-02"},
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["today"] == 1
+
+
+def test_stats_without_breakdown_skips_the_aggregates(
+    client, auth_headers, monkeypatch
+):
+    _create(client, auth_headers, "Ann", "2025-01-01", "09:00")
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("breakdown was computed")
+
+    monkeypatch.setattr(AsyncSQLiteAppointmentRepository, "count_by_day", fail)
+    monkeypatch.setattr(AsyncSQLiteAppointmentRepository, "count_by_client", fail)
+    response = client.get(
+        "/appointments/stats",
+        params={"today": "2025-01-01", "breakdown": "false"},
+        headers=auth_headers,
+    )
+
+    assert response.json() == {"total": 1, "today": 1, "per_day": [], "per_client": []}
@@ -1,5 +1,11 @@
+from passlib.context import CryptContext
+from sqlmodel import select
+
+from backend.app.core import security
+from backend.app.core.deps import token_cache, user_cache
 from backend.app.core.security import get_password_hash
 from backend.app.models import User
+from backend.app.routes import auth as auth_routes
 
 
 def test_register_returns_token(client):
@@ -43,6 +49,27 @@ def test_register_duplicate_user_fails(client):
     assert response.status_code == 400
 
 
+def test_register_race_reports_existing_user(client, session, monkeypatch):
+    original = auth_routes.hash_password_async
+
+    async def hash_while_another_request_registers(password):
+        # The same name commits while this request is hashing
+        session.add(User(username="racer", hashed_password="x", role="user"))
+        session.commit()
+        return await original(password)
+
+    monkeypatch.setattr(
+        auth_routes, "hash_password_async", hash_while_another_request_registers
+    )
+    response = client.post(
+        "/auth/register",
+        json={"username": "racer", "password": "secret"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "User already exists"
+
+
 def test_login_with_bad_password_fails(client):
     client.post(
         "/auth/register",
@@ -122,3 +149,109 @@ def test_admin_route_rejects_non_admin(client):
     headers = {"Authorization": f"Bearer {token}"}
     response = client.get("/auth/admin/ping", headers=headers)
     assert response.status_code == 403
+
+
+def test_current_user_is_cached_between_requests(client, auth_headers):
+    client.get("/appointments/", headers=auth_headers)
+    client.get("/appointments/", headers=auth_headers)
+
+    stats = user_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_role_change_invalidates_cached_user(client, session):
+    response = client.post(
+        "/auth/register",
+        json={"username": "promoted", "password": "secret"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = client.get("/auth/admin/ping", headers=headers)
+    assert response.status_code == 403
+
+    user = session.exec(select(User).where(User.username == "promoted")).one()
+    user.role = "admin"
+    session.add(user)
+    session.commit()
+
+    response = client.get("/auth/admin/ping", headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/metrics", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["user_cache"]["hits"] >= 1
+
+
+def test_user_read_between_flush_and_commit_is_not_cached_stale(client, session):
+    response = client.post(
+        "/auth/register",
+        json={"username": "midflush", "password": "secret"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    user = session.exec(select(User).where(User.username == "midflush")).one()
+    user.role = "admin"
+    session.add(user)
+    session.flush()
+    # Another request reads the committed, old row and caches it
+    assert client.get("/auth/admin/ping", headers=headers).status_code == 403
+    session.commit()
+
+    assert client.get("/auth/admin/ping", headers=headers).status_code == 200
+
+
+def test_login_rehashes_password_with_new_cost(client, session):
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5)
+    session.add(User(username="legacy", hashed_password=old_context.hash("secret")))
+    session.commit()
+
+    response = client.post(
+        "/auth/token",
+        data={"username": "legacy", "password": "secret"},
+    )
+    assert response.status_code == 200
+
+    session.expire_all()
+    user = session.exec(select(User).where(User.username == "legacy")).one()
+    assert user.hashed_password.startswith(f"$2b${security.BCRYPT_ROUNDS:02d}$")
+
+
+def test_login_sheds_load_when_hashing_is_saturated(client, monkeypatch):
+    client.post(
+        "/auth/register",
+        json={"username": "busy", "password": "secret"},
+    )
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    response = client.post(
+        "/auth/token",
+        data={"username": "busy", "password": "secret"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_verified_tokens_are_cached_until_expiry(client, auth_headers):
+    client.get("/appointments/", headers=auth_headers)
+    client.get("/appointments/", headers=auth_headers)
+
+    stats = token_cache.stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+
+
+def test_expired_token_is_not_cached(client):
+    from datetime import datetime, timedelta, timezone
+    from jose import jwt
+
+    from backend.app.core.security import ALGORITHM, SECRET_KEY
+
+    expired = datetime.now(timezone.utc) - timedelta(minutes=5)
+    token = jwt.encode(
+        {"sub": "expired", "exp": expired}, SECRET_KEY, algorithm=ALGORITHM
+    )
+
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/appointments/", headers=headers).status_code == 401
+    assert token_cache.stats()["size"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from backend.app.core import cache as cache_module
+from backend.app.core.cache import ResponseCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+
+    clock.now += 10
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+
+    clock.now += 60
+    assert cache.get("default") is None
+    assert cache.stats() == {
+        "size": 0,
+        "maxsize": 10,
+        "hits": 1,
+        "misses": 2,
+        "evictions": 0,
+        "hit_rate": 0.3333,
+    }
+
+
+def test_response_cache_shares_entries_and_invalidation_across_replicas():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = ResponseCache(maxsize=10, ttl=60, redis=lambda: redis)
+        second = ResponseCache(maxsize=10, ttl=60, redis=lambda: redis)
+
+        (generation,) = await first.generations("table")
+        await first.set(f"list:{generation}", {"body": "[]"})
+        shared = await second.get(f"list:{generation}")
+
+        await second.invalidate("table")
+        # The first replica's own copy is keyed by the old generation
+        return shared, generation, await first.generations("table")
+
+    shared, generation, after = asyncio.run(scenario())
+    assert shared == {"body": "[]"}
+    assert after == (generation + 1,)
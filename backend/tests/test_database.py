@@ -0,0 +1,127 @@
+import asyncio
+import datetime as dt
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+
+from backend.app import database
+from backend.app.database import (
+    create_async_sqlite_engine,
+    create_sqlite_engine,
+    migrate_appointment_slots,
+)
+
+
+def test_migrate_appointment_slots_normalises_legacy_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE appointment (id INTEGER PRIMARY KEY, "
+                "client_name VARCHAR, date VARCHAR, time VARCHAR, notes VARCHAR)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO appointment (client_name, date, time) VALUES "
+                "('A', '2025-01-01', '9:30'), ('B', '02/01/2025', '12:00:00')"
+            )
+        )
+
+    with engine.begin() as connection:
+        migrate_appointment_slots(connection)
+        # Running twice is a no-op
+        migrate_appointment_slots(connection)
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT date, time FROM appointment ORDER BY id")
+        ).all()
+    assert rows == [
+        ("2025-01-01", "09:30:00.000000"),
+        ("2025-01-02", "12:00:00.000000"),
+    ]
+
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("appointment")}
+    assert indexes["ix_appointment_slot"]["unique"]
+    assert indexes["ix_appointment_slot"]["column_names"] == ["date", "time"]
+    assert dt.date.fromisoformat(rows[0][0]) == dt.date(2025, 1, 1)
+
+
+def test_migrate_appointment_slots_sets_aside_unparseable_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE appointment (id INTEGER PRIMARY KEY, "
+                "client_name VARCHAR, date VARCHAR, time VARCHAR, notes VARCHAR)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO appointment (client_name, date, time) VALUES "
+                "('A', '2025-01-01', '09:00'), ('B', 'next monday', '10am')"
+            )
+        )
+
+    with engine.begin() as connection:
+        migrate_appointment_slots(connection)
+
+    with engine.connect() as connection:
+        kept = connection.execute(text("SELECT client_name FROM appointment")).all()
+        moved = connection.execute(
+            text("SELECT id, client_name, date, time FROM appointment_unparsed")
+        ).all()
+    assert kept == [("A",)]
+    assert moved == [(2, "B", "next monday", "10am")]
+
+
+def test_init_db_migrates_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        database, "engine", create_sqlite_engine(f"sqlite:///{tmp_path / 'a.db'}")
+    )
+    calls = []
+    monkeypatch.setattr(
+        database, "migrate_appointment_slots", lambda connection: calls.append(1)
+    )
+
+    database.init_db()
+    database.init_db()
+
+    assert len(calls) == 1
+    with database.engine.connect() as connection:
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+    assert version == database.SCHEMA_VERSION
+
+
+def test_sqlite_engine_applies_pragmas(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    assert engine.pool.size() == 1
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'tuned.db'}"
+    with create_sqlite_engine(url).begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    async def write_with_reader():
+        engine = create_async_sqlite_engine(
+            url.replace("sqlite://", "sqlite+aiosqlite://"), read_only=True
+        )
+        try:
+            async with engine.begin() as connection:
+                assert (
+                    await connection.execute(text("SELECT count(*) FROM t"))
+                ).scalar() == 0
+                await connection.execute(text("INSERT INTO t VALUES (1)"))
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(OperationalError):
+        asyncio.run(write_with_reader())
@@ -0,0 +1,135 @@
+import httpx
+import pytest
+
+from frontend import client as api
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    """Route the shared client to a handler the test sets."""
+    calls = []
+    handlers = []
+
+    def dispatch(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return handlers[0](request)
+
+    monkeypatch.setattr(
+        api,
+        "_client",
+        httpx.Client(base_url="http://api", transport=httpx.MockTransport(dispatch)),
+    )
+    monkeypatch.setattr(api, "_etag_cache", {})
+    monkeypatch.setattr(api, "API_RETRY_BACKOFF", 0)
+    return calls, handlers
+
+
+def test_request_retries_reads_on_gateway_errors(transport):
+    calls, handlers = transport
+    statuses = iter([503, 502, 200])
+    handlers.append(lambda request: httpx.Response(next(statuses)))
+
+    response = api._request("GET", "/appointments/")
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_request_gives_up_after_configured_retries(transport, monkeypatch):
+    calls, handlers = transport
+    monkeypatch.setattr(api, "API_RETRIES", 1)
+    handlers.append(lambda request: httpx.Response(503))
+
+    assert api._request("GET", "/appointments/").status_code == 503
+    assert len(calls) == 2
+
+
+def test_request_does_not_retry_writes_that_reached_the_server(transport):
+    calls, handlers = transport
+    handlers.append(lambda request: httpx.Response(503))
+
+    assert api._request("DELETE", "/appointments/1").status_code == 503
+    assert len(calls) == 1
+
+
+def test_request_retries_any_method_when_connect_fails(transport):
+    calls, handlers = transport
+    outcomes = iter([httpx.ConnectError("refused"), httpx.Response(204)])
+
+    def handler(request):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    handlers.append(handler)
+
+    assert api._request("DELETE", "/appointments/1").status_code == 204
+    assert len(calls) == 2
+
+
+def test_conditional_get_reuses_response_on_not_modified(transport):
+    calls, handlers = transport
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="id,client\n", headers={"ETag": '"v1"'})
+
+    handlers.append(handler)
+
+    first = api._conditional_get("/appointments/export", "token")
+    second = api._conditional_get("/appointments/export", "token")
+
+    assert second is first
+    assert second.text == "id,client\n"
+    assert "If-None-Match" not in calls[0].headers
+    assert calls[1].headers["If-None-Match"] == '"v1"'
+    assert calls[1].headers["Authorization"] == "Bearer token"
+
+
+def test_conditional_get_keys_etags_by_params(transport):
+    calls, handlers = transport
+    handlers.append(lambda request: httpx.Response(200, json=[], headers={"ETag": "x"}))
+
+    api._conditional_get("/appointments/", None, {"limit": 1})
+    api._conditional_get("/appointments/", None, {"limit": 2})
+
+    assert all("If-None-Match" not in call.headers for call in calls)
+
+
+def test_conditional_get_raises_for_errors(transport):
+    _, handlers = transport
+    handlers.append(lambda request: httpx.Response(401))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        api._conditional_get("/appointments/export", "token")
+    assert api._etag_cache == {}
+
+
+def test_appointments_csv_matches_export(client, auth_headers):
+    for time, notes in [("13:00", None), ("12:00", "first, call")]:
+        client.post(
+            "/appointments/",
+            json={
+                "client_name": "A",
+                "date": "2025-01-01",
+                "time": time,
+                "notes": notes,
+            },
+            headers=auth_headers,
+        )
+    rows = client.get("/appointments/", headers=auth_headers).json()
+
+    exported = client.get("/appointments/export", headers=auth_headers).text
+    assert api.appointments_csv(rows[::-1]) == exported
+
+
+def test_fetch_stats_asks_for_totals_only(transport):
+    calls, handlers = transport
+    handlers.append(lambda request: httpx.Response(200, json={"total": 0}))
+
+    api.fetch_stats("token")
+
+    assert calls[0].url.params["breakdown"] == "false"
+    assert "today" in calls[0].url.params
@@ -0,0 +1,87 @@
+from backend.app.workers.prompt_encoding import (
+    encode_appointments,
+    encode_changes,
+    estimate_tokens,
+    fit_to_budget,
+)
+from backend.scripts.bench_prompt_encoding import measure, synthetic_appointments
+
+
+def test_encode_appointments_groups_rows_by_date():
+    appointments = [
+        {"id": 2, "client_name": "B", "date": "2025-01-02", "time": "10:30:00"},
+        {"id": 1, "client_name": "A|x", "date": "2025-01-01", "time": "09:00:00"},
+        {
+            "id": 3,
+            "client_name": "C",
+            "date": "2025-01-02",
+            "time": "09:15:30",
+            "notes": "first\nvisit",
+        },
+    ]
+
+    lines = encode_appointments(appointments).split("\n")
+
+    assert lines[1:] == [
+        "2025-01-01 (1)",
+        "09:00|A/x",
+        "2025-01-02 (2)",
+        "09:15:30|C|first visit",
+        "10:30|B",
+    ]
+
+
+def test_compact_encoding_shrinks_large_sets():
+    sizes = measure(synthetic_appointments(10_000))
+
+    assert sizes["compact"]["bytes"] * 4 < sizes["json"]["bytes"]
+    assert sizes["compact"]["tokens"] * 3 < sizes["json"]["tokens"]
+
+
+def test_fit_to_budget_falls_back_to_daily_totals():
+    appointments = synthetic_appointments(2_000)
+
+    text = fit_to_budget(appointments, budget=1_000)
+
+    assert text.startswith("Appointment totals per date")
+    assert "2025-01-01|20|" in text
+    assert text.endswith("more dates omitted")
+    assert estimate_tokens(text) <= 1_000 + 10
+
+
+def test_encode_changes_identifies_appointments_and_moves():
+    changes = [
+        {
+            "op": "created",
+            "appointment_id": 3,
+            "client_name": "C",
+            "date": "2025-01-02",
+            "time": "09:00:00",
+        },
+        {
+            "op": "updated",
+            "appointment_id": 2,
+            "client_name": "B",
+            "date": "2025-01-01",
+            "time": "10:00:00",
+            "notes": None,
+            "old_date": "2025-01-01",
+            "old_time": "09:30:00",
+        },
+        {
+            "op": "deleted",
+            "appointment_id": 1,
+            "client_name": "A",
+            "date": "2025-01-01",
+            "time": "08:00:00",
+            "notes": "call",
+        },
+    ]
+
+    lines = encode_changes(changes).split("\n")[1:]
+
+    assert lines == [
+        "created|3|2025-01-02|09:00|C",
+        "updated|2|2025-01-01|10:00|B||was 2025-01-01 09:30",
+        "deleted|1|2025-01-01|08:00|A|call",
+    ]
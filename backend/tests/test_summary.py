@@ -1,52 +1,227 @@
+import asyncio
 import json
 
+import pytest
+
+from backend.app.core import redis_client
+from backend.app.core.redis_client import close_redis, get_redis
+from backend.app.main import app
 from backend.app.routes import summary as summary_routes
 
 
 class FakeRedis:
     def __init__(self):
         self.storage = {}
-        self.queue = []
+        self.expiry = {}
 
-    def lpush(self, key: str, value: str):
-        if key not in self.queue:
-            self.queue.append(key)
-        self.storage.setdefault(key, [])
-        self.storage[key].insert(0, value)
+    async def lpush(self, key: str, value: str):
+        self.storage.setdefault(key, []).insert(0, value)
 
-    def get(self, key: str):
+    async def get(self, key: str):
         return self.storage.get(key)
 
-    def set(self, key: str, value: str):
+    async def set(self, key: str, value: str, nx: bool = False, ex=None):
+        if nx and key in self.storage:
+            return None
         self.storage[key] = value
+        if ex is not None:
+            self.expiry[key] = ex
+        return True
 
+    async def hincrby(self, key: str, field: str, amount: int = 1):
+        counters = self.storage.setdefault(key, {})
+        counters[field] = str(int(counters.get(field, 0)) + amount)
 
-def test_queue_summary_job_enqueues_payload(client, auth_headers, monkeypatch):
-    fake_redis = FakeRedis()
-    monkeypatch.setattr(summary_routes, "redis_client", fake_redis)
+    async def hset(self, key: str, mapping: dict):
+        self.storage.setdefault(key, {}).update(
+            {field: str(value) for field, value in mapping.items()}
+        )
 
-    response = client.post("/summary/", headers=auth_headers)
-    assert response.status_code == 200
+    async def hget(self, key: str, field: str):
+        return self.storage.get(key, {}).get(field)
 
-    payload = fake_redis.storage[summary_routes.SUMMARY_QUEUE][0]
-    data = json.loads(payload)
-    assert "appointments" in data
+    async def hgetall(self, key: str):
+        return dict(self.storage.get(key, {}))
+
+    async def expire(self, key: str, seconds: int):
+        pass
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute()."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
 
 
-def test_get_summary_result_pending(client, auth_headers, monkeypatch):
-    fake_redis = FakeRedis()
-    monkeypatch.setattr(summary_routes, "redis_client", fake_redis)
+@pytest.fixture
+def fake_redis():
+    fake = FakeRedis()
+    app.dependency_overrides[get_redis] = lambda: fake
+    yield fake
 
+
+def test_queue_summary_job_enqueues_payload(client, auth_headers, fake_redis):
+    for time in ["09:00", "10:00"]:
+        client.post(
+            "/appointments/",
+            json={"client_name": "Test User", "date": "2025-01-01", "time": time},
+            headers=auth_headers,
+        )
+
+    response = client.post("/summary/?date_from=2025-01-01", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "queued"
+    assert body["count"] == 2
+
+    payload = fake_redis.storage[summary_routes.SUMMARY_QUEUE][0]
+    data = json.loads(payload)
+    assert data["job_id"] == body["job_id"]
+    assert data["username"] == "testuser"
+    # Jobs reference the rows instead of carrying them
+    assert "appointments" not in data
+    assert data["filters"] == {"date_from": "2025-01-01", "date_to": None}
+    assert data["max_id"] == 2
+    assert data["seq"] == 2
+    assert data["count"] == 2
+
+
+def test_queue_summary_job_coalesces_pending_duplicates(
+    client, auth_headers, fake_redis
+):
+    first = client.post("/summary/", headers=auth_headers).json()
+    second = client.post("/summary/", headers=auth_headers).json()
+    # A different range is a different job
+    other = client.post("/summary/?date_from=2025-01-01", headers=auth_headers).json()
+
+    assert second["job_id"] == first["job_id"]
+    assert other["job_id"] != first["job_id"]
+    assert len(fake_redis.storage[summary_routes.SUMMARY_QUEUE]) == 2
+    metrics = client.get("/summary/metrics", headers=auth_headers).json()
+    assert metrics["coalesced_on_enqueue"] == 1
+
+    # Once the worker starts the job, a new request queues a fresh one
+    job = json.loads(fake_redis.storage[summary_routes.SUMMARY_QUEUE][-1])
+    del fake_redis.storage[summary_routes.SUMMARY_PENDING_PREFIX + job["fingerprint"]]
+    third = client.post("/summary/", headers=auth_headers).json()
+    assert third["job_id"] != first["job_id"]
+
+
+def test_queue_summary_job_replaces_marker_of_a_dead_job(
+    client, auth_headers, fake_redis
+):
+    first = client.post("/summary/", headers=auth_headers).json()
+    job = json.loads(fake_redis.storage[summary_routes.SUMMARY_QUEUE][0])
+    pending_key = summary_routes.SUMMARY_PENDING_PREFIX + job["fingerprint"]
+    assert fake_redis.expiry[pending_key] == summary_routes.SUMMARY_PENDING_TTL
+
+    # Failed before it started, e.g. dead-lettered: the marker was not cleared
+    job_key = summary_routes.SUMMARY_JOB_PREFIX + first["job_id"]
+    fake_redis.storage[job_key]["status"] = "failed"
+    second = client.post("/summary/", headers=auth_headers).json()
+
+    assert second["job_id"] != first["job_id"]
+    assert fake_redis.storage[pending_key] == second["job_id"]
+    assert len(fake_redis.storage[summary_routes.SUMMARY_QUEUE]) == 2
+    # The fresh job is waiting, so it absorbs the next request
+    third = client.post("/summary/", headers=auth_headers).json()
+    assert third["job_id"] == second["job_id"]
+
+
+def test_get_summary_result_pending(client, auth_headers, fake_redis):
     response = client.get("/summary/result", headers=auth_headers)
     assert response.status_code == 200
     assert response.json() == {"status": "pending", "summary": None}
 
 
-def test_get_summary_result_ready(client, auth_headers, monkeypatch):
-    fake_redis = FakeRedis()
-    fake_redis.set(summary_routes.SUMMARY_RESULT_KEY, "hello")
-    monkeypatch.setattr(summary_routes, "redis_client", fake_redis)
+def test_get_summary_result_ready(client, auth_headers, fake_redis):
+    fake_redis.storage[summary_routes.result_key("testuser")] = "hello"
+    fake_redis.storage[summary_routes.result_key("someone-else")] = "not mine"
 
     response = client.get("/summary/result", headers=auth_headers)
     assert response.status_code == 200
     assert response.json() == {"status": "ready", "summary": "hello"}
+
+
+def test_get_summary_metrics_reports_hit_rate(client, auth_headers, fake_redis):
+    fake_redis.storage[summary_routes.SUMMARY_METRICS_KEY] = {
+        "cache_hits": "3",
+        "cache_misses": "1",
+        "breaker_state": "closed",
+    }
+
+    response = client.get("/summary/metrics", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "cache_hits": 3,
+        "cache_misses": 1,
+        "breaker_state": "closed",
+        "cache_hit_rate": 0.75,
+    }
+
+
+def test_get_summary_job_tracks_status(client, auth_headers, fake_redis):
+    job_id = client.post("/summary/", headers=auth_headers).json()["job_id"]
+
+    response = client.get(f"/summary/{job_id}", headers=auth_headers)
+    assert response.status_code == 200
+    job = response.json()
+    assert job["job_id"] == job_id
+    assert job["status"] == "queued"
+    assert job["count"] == 0
+    assert "queued_at" in job
+    assert "username" not in job
+
+    # Written by the worker when the job completes
+    fake_redis.storage[summary_routes.SUMMARY_JOB_PREFIX + job_id].update(
+        {"status": "done", "summary": "all good"}
+    )
+    job = client.get(f"/summary/{job_id}", headers=auth_headers).json()
+    assert job["status"] == "done"
+    assert job["summary"] == "all good"
+
+
+def test_get_summary_job_hides_other_users_jobs(client, auth_headers, fake_redis):
+    fake_redis.storage[summary_routes.SUMMARY_JOB_PREFIX + "abc"] = {
+        "status": "queued",
+        "username": "someone-else",
+        "count": "0",
+    }
+
+    assert client.get("/summary/abc", headers=auth_headers).status_code == 404
+    assert client.get("/summary/missing", headers=auth_headers).status_code == 404
+
+
+def test_get_redis_shares_one_bounded_pool():
+    client = get_redis()
+    try:
+        assert get_redis() is client
+        pool = client.connection_pool
+        assert pool.max_connections == redis_client.REDIS_MAX_CONNECTIONS
+    finally:
+        asyncio.run(close_redis())
+    assert redis_client._client is None
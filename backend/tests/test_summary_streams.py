@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import time
+import types
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+
+from backend.app.core.redis_client import get_redis
+from backend.app.main import app
+from backend.app.routes import summary as summary_routes
+from backend.app.workers import summary_worker
+from backend.app.workers.resilience import CircuitBreaker
+from backend.app.workers.transports import StreamQueue
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(summary_worker, "breaker", CircuitBreaker(5, 30))
+    monkeypatch.setattr(summary_worker, "_published_breaker_state", None)
+    # Failures go straight to the transport's retry handling
+    monkeypatch.setattr(summary_worker, "AGENT_ATTEMPTS", 1)
+
+
+class FakeAgent:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+
+    async def run(self, prompt: str):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return types.SimpleNamespace(data="ready")
+
+
+def _queue(client, consumer: str, max_deliveries: int = 3) -> StreamQueue:
+    return StreamQueue(
+        client,
+        summary_worker.STREAM,
+        summary_worker.STREAM_GROUP,
+        consumer,
+        dead_letter_stream=summary_worker.DEAD_LETTER_STREAM,
+        max_deliveries=max_deliveries,
+        claim_idle_ms=0,
+        claim_interval=0,
+    )
+
+
+async def _add_job(client, job_id: str) -> None:
+    job = {"job_id": job_id, "appointments": [{"id": 1, "client_name": "A"}]}
+    await client.xadd(summary_worker.STREAM, {"job": json.dumps(job)})
+
+
+async def _job_status(client, job_id: str):
+    status = await client.hget(summary_worker.SUMMARY_JOB_PREFIX + job_id, "status")
+    return status.decode() if status else None
+
+
+async def _run_worker_until(client, queue, done, timeout: float = 5):
+    # One slot: with claim_idle_ms=0 a second slot would reclaim the entry
+    # still being processed
+    stop_event = asyncio.Event()
+    loop_task = asyncio.create_task(
+        summary_worker.worker_loop(client, 1, stop_event, queue)
+    )
+    deadline = time.monotonic() + timeout
+    while not await done() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    stop_event.set()
+    await loop_task
+
+
+def test_queue_summary_job_adds_stream_entry(client, auth_headers, monkeypatch):
+    fake_redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    app.dependency_overrides[get_redis] = lambda: fake_redis
+    monkeypatch.setattr(summary_routes, "SUMMARY_TRANSPORT", "stream")
+
+    job_id = client.post("/summary/", headers=auth_headers).json()["job_id"]
+
+    async def queued():
+        entries = await fake_redis.xrange(summary_routes.SUMMARY_STREAM)
+        return entries, await fake_redis.llen(summary_routes.SUMMARY_QUEUE)
+
+    [(_, fields)], list_length = asyncio.run(queued())
+    assert json.loads(fields["job"])["job_id"] == job_id
+    assert list_length == 0
+
+
+def test_stream_worker_acks_processed_jobs(monkeypatch):
+    monkeypatch.setattr(summary_worker, "agent", FakeAgent())
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        queue = _queue(client, "worker-1")
+        await queue.setup()
+        await _add_job(client, "a")
+
+        async def done():
+            return await _job_status(client, "a") == "done"
+
+        await _run_worker_until(client, queue, done)
+        pending = await client.xpending(
+            summary_worker.STREAM, summary_worker.STREAM_GROUP
+        )
+        return await client.xlen(summary_worker.STREAM), pending["pending"]
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_stream_worker_reclaims_jobs_of_crashed_consumer(monkeypatch):
+    monkeypatch.setattr(summary_worker, "agent", FakeAgent())
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        crashed = _queue(client, "worker-1")
+        await crashed.setup()
+        await _add_job(client, "a")
+        # Delivered to worker-1, which dies before acknowledging it
+        assert await crashed.fetch() is not None
+
+        async def done():
+            return await _job_status(client, "a") == "done"
+
+        await _run_worker_until(client, _queue(client, "worker-2"), done)
+        return await _job_status(client, "a"), await client.xlen(summary_worker.STREAM)
+
+    assert asyncio.run(scenario()) == ("done", 0)
+
+
+def test_stream_worker_dead_letters_after_max_deliveries(monkeypatch):
+    agent = FakeAgent(error=RuntimeError("provider down"))
+    monkeypatch.setattr(summary_worker, "agent", agent)
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        queue = _queue(client, "worker-1", max_deliveries=2)
+        await queue.setup()
+        await _add_job(client, "a")
+
+        async def dead_lettered():
+            return await client.xlen(summary_worker.DEAD_LETTER_STREAM) > 0
+
+        await _run_worker_until(client, queue, dead_lettered)
+        [(_, fields)] = await client.xrange(summary_worker.DEAD_LETTER_STREAM)
+        return fields, await _job_status(client, "a")
+
+    fields, status = asyncio.run(scenario())
+    assert agent.calls == 2
+    assert fields[b"deliveries"] == b"2"
+    assert fields[b"error"] == b"provider down"
+    assert status == "failed"
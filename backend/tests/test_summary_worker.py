@@ -1,11 +1,25 @@
 import asyncio
+import datetime as dt
 import json
 import os
 import types
 
+import pytest
+
 os.environ.setdefault("GOOGLE_API_KEY", "test-key")
 
+from backend.app.models import Appointment, AppointmentCreate, AppointmentUpdate
+from backend.app.repository_sqlite import SQLiteAppointmentRepository
 from backend.app.workers import summary_worker
+from backend.app.workers import resilience
+from backend.app.workers.resilience import CircuitBreaker, CircuitOpenError
+from backend.app.workers.transports import ListQueue
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(summary_worker, "breaker", CircuitBreaker(5, 30))
+    monkeypatch.setattr(summary_worker, "_published_breaker_state", None)
 
 
 class FakeAgent:
@@ -22,21 +36,105 @@ def test_generate_summary_uses_agent(monkeypatch):
     fake_agent = FakeAgent("summary text")
     monkeypatch.setattr(summary_worker, "agent", fake_agent)
 
-    appointments = [{"id": 1, "client_name": "A"}]
+    appointments = [
+        {"id": 1, "client_name": "A", "date": "2025-01-01", "time": "09:00:00"}
+    ]
     result = summary_worker.generate_summary(appointments)
     summary = summary_worker.asyncio.run(result)
 
     assert summary == "summary text"
     assert "appointments" in fake_agent.last_prompt
-    assert json.dumps(appointments, indent=2) in fake_agent.last_prompt
+    assert "\n2025-01-01 (1)\n09:00|A" in fake_agent.last_prompt
 
 
 class FakeRedis:
     def __init__(self):
         self.data = {}
+        self.expiry = {}
+        self.index = {}
+        self.counters = {}
+        self.hashes = {}
+        self.jobs = []
 
-    async def set(self, key: str, value: str):
+    async def get(self, key: str):
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex=None):
         self.data[key] = value
+        if ex is not None:
+            self.expiry[key] = ex
+
+    async def lrange(self, key: str, start: int, end: int):
+        return self.jobs[start : None if end == -1 else end + 1]
+
+    async def rpush(self, key: str, value: str):
+        self.jobs.append(value)
+
+    async def lrem(self, key: str, count: int, value: str):
+        if value in self.jobs:
+            self.jobs.remove(value)
+            return 1
+        return 0
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def hset(self, key: str, mapping: dict):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def hgetall(self, key: str):
+        return dict(self.hashes.get(key, {}))
+
+    async def expire(self, key: str, seconds: int):
+        self.expiry[key] = seconds
+
+    async def hincrby(self, key: str, field: str, amount: int = 1):
+        self.counters[field] = self.counters.get(field, 0) + amount
+
+    async def zadd(self, key: str, mapping: dict):
+        self.index.update(mapping)
+
+    async def zcard(self, key: str):
+        return len(self.index)
+
+    def pipeline(self, transaction: bool = True):
+        return FakeWatchPipeline(self)
+
+    async def zpopmin(self, key: str, count: int = 1):
+        oldest = sorted(self.index.items(), key=lambda item: item[1])[:count]
+        for member, _ in oldest:
+            del self.index[member]
+        return oldest
+
+
+class FakeWatchPipeline:
+    """WATCH/MULTI pipeline: reads run at once, queued deletes on execute()."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.deletes = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def watch(self, *keys):
+        pass
+
+    async def get(self, key: str):
+        return await self.redis.get(key)
+
+    def multi(self):
+        pass
+
+    def delete(self, *keys):
+        self.deletes.extend(keys)
+
+    async def execute(self):
+        await self.redis.delete(*self.deletes)
 
 
 def test_process_job_sets_summary(monkeypatch):
@@ -51,3 +149,539 @@ def test_process_job_sets_summary(monkeypatch):
 
     assert count == 1
     assert fake_redis.data[summary_worker.SUMMARY_RESULT_KEY] == "ready"
+
+
+def test_process_job_tracks_job_status_and_user_result(monkeypatch):
+    monkeypatch.setattr(summary_worker, "agent", FakeAgent("ready"))
+    fake_redis = FakeRedis()
+
+    job = {"job_id": "abc", "username": "alice", "appointments": [{"id": 1}]}
+    asyncio.run(summary_worker.process_job(fake_redis, json.dumps(job)))
+
+    status = fake_redis.hashes[summary_worker.SUMMARY_JOB_PREFIX + "abc"]
+    assert status["status"] == "done"
+    assert status["summary"] == "ready"
+    assert status["count"] == 1
+    assert status["started_at"] <= status["finished_at"]
+    assert fake_redis.data[f"{summary_worker.SUMMARY_RESULT_KEY}:alice"] == "ready"
+    assert summary_worker.SUMMARY_RESULT_KEY not in fake_redis.data
+
+
+def test_process_job_reuses_cached_summary(monkeypatch):
+    agent = SlowAgent(delay=0)
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+
+    rows = [{"id": 1, "client_name": "A"}, {"id": 2, "client_name": "B"}]
+    first = json.dumps({"appointments": rows})
+    # Same set in a different order hashes to the same key
+    second = json.dumps({"appointments": rows[::-1]})
+    asyncio.run(summary_worker.process_job(fake_redis, first))
+    asyncio.run(summary_worker.process_job(fake_redis, second))
+
+    assert agent.completed == 1
+    assert fake_redis.counters["cache_misses"] == 1
+    assert fake_redis.counters["cache_hits"] == 1
+    key = summary_worker.summary_cache_key(rows)
+    assert fake_redis.data[key] == "done"
+    assert fake_redis.expiry[key] == summary_worker.SUMMARY_CACHE_TTL
+
+
+def test_summary_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(summary_worker, "agent", FakeAgent("ready"))
+    monkeypatch.setattr(summary_worker, "SUMMARY_CACHE_MAX_ENTRIES", 2)
+    fake_redis = FakeRedis()
+
+    sets = [[{"id": i}] for i in range(3)]
+    for appointments in sets:
+        asyncio.run(summary_worker.cached_summary(fake_redis, appointments))
+
+    keys = [summary_worker.summary_cache_key(a) for a in sets]
+    assert keys[0] not in fake_redis.data
+    assert all(key in fake_redis.data for key in keys[1:])
+    assert len(fake_redis.index) == 2
+
+
+class CountingAgent:
+    def __init__(self):
+        self.prompts = []
+
+    async def run(self, prompt: str):
+        self.prompts.append(prompt)
+        return types.SimpleNamespace(data=f"summary {len(self.prompts)}")
+
+
+def _rows_over_days(days: int, per_day: int) -> list[dict]:
+    return [
+        {"id": day * per_day + i, "date": f"2025-01-0{day + 1}", "time": "09:00:00"}
+        for day in range(days)
+        for i in range(per_day)
+    ]
+
+
+def test_split_into_chunks_keeps_dates_together():
+    rows = _rows_over_days(days=2, per_day=3)[::-1]
+
+    chunks = summary_worker.split_into_chunks(rows, max_rows=2)
+
+    assert [[row["id"] for row in chunk] for chunk in chunks] == [
+        [0, 1],
+        [2],
+        [3, 4],
+        [5],
+    ]
+
+
+def test_split_into_chunks_packs_sparse_dates_by_calendar_window():
+    start = dt.date(2025, 1, 1)
+    rows = [
+        {"id": i, "date": (start + dt.timedelta(days=i // 2)).isoformat()}
+        for i in range(600)
+    ]
+
+    chunks = summary_worker.split_into_chunks(rows, max_rows=100)
+
+    # 300 days in 10 months of at most 62 rows each, not one call per day
+    assert len(chunks) == 10
+    assert all(len({row["date"][:7] for row in chunk}) == 1 for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == 600
+
+
+def test_split_into_chunks_respects_token_budget():
+    rows = [{"id": i, "date": "2025-01-01", "client_name": "x" * 40} for i in range(10)]
+
+    chunks = summary_worker.split_into_chunks(rows, max_rows=100, budget=40)
+
+    assert len(chunks) > 1
+    assert [row["id"] for chunk in chunks for row in chunk] == list(range(10))
+
+
+def test_reduce_summaries_combines_in_stages_within_budget(monkeypatch):
+    agent = CountingAgent()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "PROMPT_TOKEN_BUDGET", 10)
+
+    partials = ["p" * 20 for _ in range(5)]
+    result = asyncio.run(summary_worker.reduce_summaries(FakeRedis(), partials))
+
+    # 5 partials -> 2 groups -> 1, never all five in one prompt
+    assert len(agent.prompts) == 3
+    assert all(prompt.count("p" * 20) <= 3 for prompt in agent.prompts)
+    assert result == "summary 3"
+
+
+def test_map_reduce_only_recomputes_changed_chunks(monkeypatch):
+    agent = CountingAgent()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "SUMMARY_CHUNK_ROWS", 2)
+    fake_redis = FakeRedis()
+    rows = _rows_over_days(days=3, per_day=2)
+
+    first = asyncio.run(summary_worker.summarise(fake_redis, rows))
+    # One call per day, then the reduce step
+    assert len(agent.prompts) == 4
+    assert agent.prompts[-1].startswith(summary_worker.REDUCE_INSTRUCTION)
+    assert first == "summary 4"
+
+    rows[-1] = {**rows[-1], "notes": "moved"}
+    second = asyncio.run(summary_worker.summarise(fake_redis, rows))
+
+    # Only the changed day and the reduce step reach the agent
+    assert len(agent.prompts) == 6
+    assert "|moved" in agent.prompts[4]
+    assert second == "summary 6"
+
+
+def test_map_reduce_bounds_chunk_concurrency(monkeypatch):
+    agent = SlowAgent(delay=0.02)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "SUMMARY_CHUNK_ROWS", 1)
+    monkeypatch.setattr(summary_worker, "SUMMARY_CHUNK_CONCURRENCY", 2)
+
+    rows = _rows_over_days(days=5, per_day=1)
+    asyncio.run(summary_worker.summarise(FakeRedis(), rows))
+
+    assert agent.completed == 6
+    assert agent.max_running == 2
+
+
+class FailFirstAgent:
+    """Fails the call for the first day at once; the others take a while."""
+
+    def __init__(self):
+        self.cancelled = 0
+        self.completed = 0
+
+    async def run(self, prompt: str):
+        if "2025-01-01" in prompt:
+            raise RuntimeError("provider error")
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.completed += 1
+        return types.SimpleNamespace(data="done")
+
+
+def test_map_reduce_cancels_sibling_chunks_when_one_fails(monkeypatch):
+    agent = FailFirstAgent()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "AGENT_ATTEMPTS", 1)
+    monkeypatch.setattr(summary_worker, "SUMMARY_CHUNK_ROWS", 1)
+    rows = _rows_over_days(days=4, per_day=1)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await summary_worker.summarise(FakeRedis(), rows)
+        # Nothing keeps calling the provider after the job failed
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+
+    assert agent.cancelled == 3
+    assert agent.completed == 0
+    assert summary_worker.breaker.failures == 1
+
+
+def test_process_job_loads_referenced_appointments(monkeypatch, session, async_engine):
+    for client_name, date in [("A", "2025-01-01"), ("B", "2025-01-02")]:
+        session.add(
+            Appointment(
+                client_name=client_name,
+                date=dt.date.fromisoformat(date),
+                time=dt.time(9, 0),
+            )
+        )
+    session.commit()
+
+    monkeypatch.setattr(summary_worker, "async_read_engine", async_engine)
+    fake_agent = FakeAgent("ready")
+    monkeypatch.setattr(summary_worker, "agent", fake_agent)
+
+    job = {"filters": {"date_from": "2025-01-02", "date_to": None}}
+    count = asyncio.run(summary_worker.process_job(FakeRedis(), json.dumps(job)))
+
+    assert count == 1
+    assert "2025-01-02 (1)\n09:00|B" in fake_agent.last_prompt
+    assert "|A" not in fake_agent.last_prompt
+
+
+def test_full_run_saves_the_seq_its_rows_were_read_at(
+    monkeypatch, session, async_engine
+):
+    monkeypatch.setattr(summary_worker, "async_read_engine", async_engine)
+    agent = CountingAgent()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    repo = SQLiteAppointmentRepository(session)
+    repo.create(AppointmentCreate(client_name="A", date="2025-01-01", time="09:00"))
+    job = {"job_id": "a", "username": "u", "seq": repo.latest_seq()}
+    # Written after the job was queued, before the worker picked it up
+    repo.create(AppointmentCreate(client_name="B", date="2025-01-01", time="10:00"))
+    fake_redis = FakeRedis()
+
+    assert asyncio.run(summary_worker.process_job(fake_redis, json.dumps(job))) == 2
+
+    assert "|B" in agent.prompts[-1]
+    state = fake_redis.hashes[summary_worker.SUMMARY_STATE_PREFIX + "u"]
+    # B is in the summary, so it must not be replayed as a change later
+    assert state["seq"] == 2
+
+
+def test_process_job_updates_summary_from_change_log(
+    monkeypatch, session, async_engine
+):
+    monkeypatch.setattr(summary_worker, "async_read_engine", async_engine)
+    agent = CountingAgent()
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    repo = SQLiteAppointmentRepository(session)
+    fake_redis = FakeRedis()
+
+    def run(job_id: str, count: int = 2) -> int:
+        job = {
+            "job_id": job_id,
+            "username": "u",
+            "seq": repo.latest_seq(),
+            "count": count,
+        }
+        return asyncio.run(summary_worker.process_job(fake_redis, json.dumps(job)))
+
+    for client_name, time in [("A", "09:00"), ("B", "09:30")]:
+        repo.create(
+            AppointmentCreate(client_name=client_name, date="2025-01-01", time=time)
+        )
+    assert run("a") == 2
+    assert agent.prompts[-1].startswith(summary_worker.FULL_INSTRUCTION)
+
+    repo.update(2, AppointmentUpdate(time="10:00", notes="moved"))
+    assert run("b") == 2
+    prompt = agent.prompts[-1]
+    assert prompt.startswith(summary_worker.INCREMENTAL_INSTRUCTION)
+    assert "summary 1" in prompt
+    assert "updated|2|2025-01-01|10:00|B|moved|was 2025-01-01 09:30" in prompt
+    assert "|A" not in prompt
+    assert fake_redis.data["latest_summary:u"] == "summary 2"
+
+    # Nothing changed since: the stored summary is reused as it is
+    run("c")
+    assert len(agent.prompts) == 2
+
+    monkeypatch.setattr(summary_worker, "INCREMENTAL_MAX_CHANGES", 1)
+    repo.delete(1)
+    repo.create(AppointmentCreate(client_name="C", date="2025-01-02", time="09:00"))
+    run("d")
+    assert agent.prompts[-1].startswith(summary_worker.FULL_INSTRUCTION)
+    assert fake_redis.counters["incremental_runs"] == 2
+    assert fake_redis.counters["full_runs"] == 2
+
+
+def test_incremental_summary_runs_in_full_after_a_reset():
+    state = {"summary": "old", "seq": "5", "runs": "1"}
+
+    # The log is behind the stored summary: the database was recreated
+    assert (
+        asyncio.run(summary_worker.incremental_summary(FakeRedis(), {"seq": 2}, state))
+        is None
+    )
+    assert (
+        asyncio.run(summary_worker.incremental_summary(FakeRedis(), {"seq": 5}, state))
+        == "old"
+    )
+
+
+class FakeQueueRedis(FakeRedis):
+    def __init__(self, jobs):
+        super().__init__()
+        self.jobs.extend(jobs)
+
+    async def blpop(self, key: str, timeout: int = 0):
+        if not self.jobs:
+            await asyncio.sleep(0.01)
+            return None
+        return key, self.jobs.pop(0)
+
+
+class SlowAgent:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.completed = 0
+
+    async def run(self, prompt: str):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        self.completed += 1
+        return types.SimpleNamespace(data="done")
+
+
+async def _run_until_idle(fake_redis, agent, concurrency):
+    stop_event = asyncio.Event()
+    loop_task = asyncio.create_task(
+        summary_worker.worker_loop(fake_redis, concurrency, stop_event)
+    )
+    while fake_redis.jobs or agent.running:
+        await asyncio.sleep(0.01)
+    stop_event.set()
+    await loop_task
+
+
+def test_worker_loop_runs_jobs_concurrently(monkeypatch):
+    agent = SlowAgent(delay=0.05)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    # Distinct sets, so none of the jobs is answered from the summary cache
+    jobs = [json.dumps({"appointments": [{"id": i}]}) for i in range(6)]
+    fake_redis = FakeQueueRedis(jobs)
+
+    asyncio.run(_run_until_idle(fake_redis, agent, 3))
+
+    assert agent.completed == 6
+    assert agent.max_running == 3
+
+
+def test_worker_loop_coalesces_queued_duplicates(monkeypatch):
+    agent = SlowAgent(delay=0.01)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+
+    def job(job_id, fingerprint, rows):
+        return json.dumps(
+            {
+                "job_id": job_id,
+                "username": "alice",
+                "fingerprint": fingerprint,
+                "appointments": [{"id": i} for i in rows],
+            }
+        )
+
+    fake_redis = FakeQueueRedis(
+        [job("a", "same", [1]), job("b", "other", [2]), job("c", "same", [1])]
+    )
+    fake_redis.data[summary_worker.SUMMARY_PENDING_PREFIX + "same"] = "a"
+
+    asyncio.run(_run_until_idle(fake_redis, agent, 1))
+
+    assert agent.completed == 2
+    assert fake_redis.counters["coalesced_in_queue"] == 1
+    for job_id in "abc":
+        status = fake_redis.hashes[summary_worker.SUMMARY_JOB_PREFIX + job_id]
+        assert status["status"] == "done"
+    assert summary_worker.SUMMARY_PENDING_PREFIX + "same" not in fake_redis.data
+
+
+def test_take_duplicates_only_scans_the_next_jobs(monkeypatch):
+    monkeypatch.setattr(summary_worker, "COALESCE_SCAN", 2)
+    fake_redis = FakeRedis()
+
+    def job(job_id, fingerprint):
+        return json.dumps({"job_id": job_id, "fingerprint": fingerprint})
+
+    fake_redis.jobs = [job("b", "same"), job("c", "other"), job("d", "same")]
+
+    duplicates = asyncio.run(
+        summary_worker.take_duplicates(fake_redis, json.loads(job("a", "same")))
+    )
+
+    # "d" lies beyond the scanned window and runs as a job of its own
+    assert [d["job_id"] for d in duplicates] == ["b"]
+    assert len(fake_redis.jobs) == 2
+
+
+def test_process_job_keeps_a_pending_marker_it_does_not_own(monkeypatch):
+    monkeypatch.setattr(summary_worker, "agent", FakeAgent("ready"))
+    fake_redis = FakeRedis()
+    key = summary_worker.SUMMARY_PENDING_PREFIX + "same"
+    # The job's marker expired and a newer identical job claimed it
+    fake_redis.data[key] = "newer"
+
+    job = {"job_id": "older", "fingerprint": "same", "appointments": [{"id": 1}]}
+    asyncio.run(summary_worker.process_job(fake_redis, json.dumps(job)))
+
+    assert fake_redis.data[key] == "newer"
+
+
+def test_worker_loop_times_out_slow_jobs(monkeypatch):
+    agent = SlowAgent(delay=5)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "JOB_TIMEOUT", 0.05)
+    job = {"job_id": "slow", "appointments": []}
+    fake_redis = FakeQueueRedis([json.dumps(job)])
+
+    asyncio.run(_run_until_idle(fake_redis, agent, 1))
+
+    assert agent.completed == 0
+    assert summary_worker.SUMMARY_RESULT_KEY not in fake_redis.data
+    status = fake_redis.hashes[summary_worker.SUMMARY_JOB_PREFIX + "slow"]
+    assert status["status"] == "failed"
+    assert "Timed out" in status["error"]
+
+
+def test_timed_out_job_counts_one_breaker_failure(monkeypatch):
+    agent = SlowAgent(delay=5)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "JOB_TIMEOUT", 0.05)
+    monkeypatch.setattr(summary_worker, "SUMMARY_CHUNK_ROWS", 1)
+    # Four chunk calls in flight when the timeout cancels them
+    job = {"job_id": "slow", "appointments": _rows_over_days(days=4, per_day=1)}
+    fake_redis = FakeQueueRedis([json.dumps(job)])
+
+    asyncio.run(_run_until_idle(fake_redis, agent, 1))
+
+    assert agent.max_running == 4
+    assert summary_worker.breaker.failures == 1
+    assert summary_worker.breaker.state == "closed"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_circuit_breaker_opens_and_half_opens(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # A cancelled trial lets the next call try again
+    breaker.record_cancelled()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.times_opened == 1
+
+
+class FlakyAgent:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    async def run(self, prompt: str):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("provider error")
+        return types.SimpleNamespace(data="ok")
+
+
+def test_call_agent_retries_with_backoff(monkeypatch):
+    agent = FlakyAgent(failures=2)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    monkeypatch.setattr(summary_worker, "RETRY_BASE_DELAY", 0)
+
+    assert asyncio.run(summary_worker.call_agent("prompt")) == "ok"
+    assert agent.calls == 3
+    assert summary_worker.breaker.state == "closed"
+
+    agent = FlakyAgent(failures=5)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    with pytest.raises(RuntimeError):
+        asyncio.run(summary_worker.call_agent("prompt"))
+    assert agent.calls == summary_worker.AGENT_ATTEMPTS
+
+
+def test_run_job_requeues_while_breaker_open(monkeypatch):
+    agent = FlakyAgent(failures=0)
+    monkeypatch.setattr(summary_worker, "agent", agent)
+    for _ in range(summary_worker.breaker.failure_threshold):
+        summary_worker.breaker.record_failure()
+    fake_redis = FakeQueueRedis([])
+    raw = json.dumps({"job_id": "a", "appointments": [{"id": 1}]})
+
+    asyncio.run(
+        summary_worker.run_job(
+            fake_redis,
+            ListQueue(fake_redis, summary_worker.QUEUE),
+            (raw, None, 1),
+            asyncio.Semaphore(0),
+        )
+    )
+
+    assert agent.calls == 0
+    assert fake_redis.jobs == [raw]
+    assert fake_redis.hashes[summary_worker.SUMMARY_JOB_PREFIX + "a"]["status"] == (
+        "queued"
+    )
+    assert fake_redis.counters["requeued"] == 1
+    metrics = fake_redis.hashes[summary_worker.SUMMARY_METRICS_KEY]
+    assert metrics == {"breaker_state": "open", "breaker_opened": 1}
@@ -1,9 +1,94 @@
+import csv
 import httpx
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from io import StringIO
 
 import os
 
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "10"))
+EXPORT_COLUMNS = ["id", "client_name", "date", "time", "notes"]
+# Extra attempts for failed reads, waiting RETRY_BACKOFF * 2**n between
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.3"))
+# Threads issuing the dashboard's reads at the same time
+API_READ_WORKERS = int(os.getenv("API_READ_WORKERS", "4"))
+
+RETRY_STATUSES = {502, 503, 504}
+# A repeated DELETE whose first attempt went through would answer 404, so
+# only reads are retried once the request may have reached the server
+RETRY_METHODS = {"GET", "HEAD"}
+
+# Last response per request, revalidated with If-None-Match on the next read
+_etag_cache: dict[tuple, tuple[str, httpx.Response]] = {}
+
+_client: httpx.Client | None = None
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_client() -> httpx.Client:
+    """
+    Shared client, so requests reuse pooled keep-alive connections instead
+    of opening a new one each. Streamlit reruns the page script but keeps
+    imported modules, so it lives for the whole process.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.Client(
+            base_url=API_BASE_URL,
+            timeout=httpx.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=API_MAX_CONNECTIONS,
+                max_keepalive_connections=API_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # httpx.Client is thread-safe, so the threads share its connection pool
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=API_READ_WORKERS, thread_name_prefix="api-read"
+        )
+    return _executor
+
+
+def _should_retry(method: str, attempt: int, response=None, error=None) -> bool:
+    if attempt >= API_RETRIES:
+        return False
+    # Nothing reached the server, so any request can be sent again
+    if isinstance(error, httpx.ConnectError):
+        return True
+    if method not in RETRY_METHODS:
+        return False
+    if error is not None:
+        return isinstance(error, httpx.TransportError)
+    return response.status_code in RETRY_STATUSES
+
+
+def _retry_delay(attempt: int) -> float:
+    return API_RETRY_BACKOFF * 2**attempt
+
+
+def _request(method: str, path: str, **kwargs) -> httpx.Response:
+    attempt = 0
+    while True:
+        try:
+            response = get_client().request(method, path, **kwargs)
+        except httpx.TransportError as exc:
+            if not _should_retry(method, attempt, error=exc):
+                raise
+        else:
+            if not _should_retry(method, attempt, response=response):
+                return response
+        time.sleep(_retry_delay(attempt))
+        attempt += 1
 
 
 def _auth_headers(token: str | None) -> dict:
@@ -12,24 +97,65 @@ def _auth_headers(token: str | None) -> dict:
     return {"Authorization": f"Bearer {token}"}
 
 
+def _etag_key(path: str, params: dict | None) -> tuple:
+    # Appointments are shared by all users, and a 304 still requires auth
+    return path, tuple(sorted((params or {}).items()))
+
+
+def _conditional_headers(key: tuple, token: str | None) -> dict:
+    headers = _auth_headers(token)
+    cached = _etag_cache.get(key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    return headers
+
+
+def _revalidated(key: tuple, response: httpx.Response) -> httpx.Response:
+    """The stored response on 304 Not Modified, otherwise the new one."""
+    cached = _etag_cache.get(key)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    if "ETag" in response.headers:
+        _etag_cache[key] = (response.headers["ETag"], response)
+    return response
+
+
+def _conditional_get(path: str, token: str | None, params: dict | None = None):
+    """
+    GET that sends the ETag of the last response for the same request and
+    reuses that response when the server answers 304 Not Modified.
+    """
+    key = _etag_key(path, params)
+    headers = _conditional_headers(key, token)
+    return _revalidated(key, _request("GET", path, params=params, headers=headers))
+
+
 def register_user(username: str, password: str) -> dict:
     payload = {"username": username, "password": password}
-    response = httpx.post(f"{API_BASE_URL}/auth/register", json=payload)
+    response = _request("POST", "/auth/register", json=payload)
     response.raise_for_status()
     return response.json()
 
 
 def login_user(username: str, password: str) -> dict:
     payload = {"username": username, "password": password}
-    response = httpx.post(f"{API_BASE_URL}/auth/token", data=payload)
+    response = _request("POST", "/auth/token", data=payload)
     response.raise_for_status()
     return response.json()
 
 
-def list_appointments(token: str):
-    response = httpx.get(f"{API_BASE_URL}/appointments/", headers=_auth_headers(token))
-    response.raise_for_status()
-    return response.json()
+def list_appointments(token: str, page_size: int = 500, **filters):
+    appointments = []
+    params = {"limit": page_size, **filters}
+    while True:
+        response = _conditional_get("/appointments/", token, params)
+        appointments.extend(response.json())
+
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return appointments
+        params["cursor"] = cursor
 
 
 def create_appointment(
@@ -41,44 +167,152 @@ def create_appointment(
         "time": time_str,
         "notes": notes,
     }
-    response = httpx.post(
-        f"{API_BASE_URL}/appointments/",
-        json=payload,
-        headers=_auth_headers(token),
+    response = _request(
+        "POST", "/appointments/", json=payload, headers=_auth_headers(token)
     )
     response.raise_for_status()
     return response.json()
 
 
 def delete_appointment(token: str, appointment_id: int):
-    response = httpx.delete(
-        f"{API_BASE_URL}/appointments/{appointment_id}",
-        headers=_auth_headers(token),
+    response = _request(
+        "DELETE", f"/appointments/{appointment_id}", headers=_auth_headers(token)
     )
     response.raise_for_status()
 
 
 def export_appointments_csv(token: str) -> str:
-    response = httpx.get(
-        f"{API_BASE_URL}/appointments/export",
-        headers=_auth_headers(token),
-    )
-    response.raise_for_status()
-    return response.text
+    return _conditional_get("/appointments/export", token).text
 
 
 def request_summary(token: str) -> dict:
-    response = httpx.post(f"{API_BASE_URL}/summary/", headers=_auth_headers(token))
+    response = _request("POST", "/summary/", headers=_auth_headers(token))
     response.raise_for_status()
     return response.json()
 
 
+def fetch_summary_job(token: str, job_id: str) -> dict:
+    response = _request("GET", f"/summary/{job_id}", headers=_auth_headers(token))
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_stats(token: str, breakdown: bool = False, **params) -> dict:
+    """
+    Total and today's counts; see GET /appointments/stats. The per-day and
+    per-client counts cover the whole range, so they are only computed when
+    ``breakdown`` asks for them.
+    """
+    params.setdefault("today", date.today().isoformat())
+    params["breakdown"] = "true" if breakdown else "false"
+    return _conditional_get("/appointments/stats", token, params).json()
+
+
 def fetch_summary_result(token: str) -> dict:
-    response = httpx.get(f"{API_BASE_URL}/summary/result", headers=_auth_headers(token))
+    response = _request("GET", "/summary/result", headers=_auth_headers(token))
     response.raise_for_status()
     return response.json()
 
 
-def count_appointments_today(appointments: list[dict]) -> int:
-    today_str = date.today().strftime("%Y-%m-%d")
-    return sum(1 for a in appointments if a["date"] == today_str)
+def apply_changes(rows: dict[int, dict], changes: list[dict]) -> None:
+    """Merge change log entries, oldest first, into rows keyed by id."""
+    for change in changes:
+        appointment_id = change["appointment_id"]
+        if change["op"] == "deleted":
+            rows.pop(appointment_id, None)
+        else:
+            rows[appointment_id] = {
+                "id": appointment_id,
+                "client_name": change["client_name"],
+                "date": change["date"],
+                "time": change["time"],
+                "notes": change["notes"],
+            }
+
+
+def _sync_appointments(token: str, synced: dict | None, page_size: int) -> dict:
+    """
+    Bring ``synced`` (``{"rows": {id: row}, "seq": n}``) up to date from the
+    change log, updating it in place. Without a copy yet, or after the
+    database was reset, the whole list is downloaded once instead.
+    """
+    headers = _auth_headers(token)
+    if synced is not None:
+        while True:
+            response = _request(
+                "GET",
+                "/appointments/changes",
+                params={"since": synced["seq"], "limit": page_size},
+                headers=headers,
+            )
+            response.raise_for_status()
+            page = response.json()
+            if page["latest_seq"] < synced["seq"]:
+                break
+            apply_changes(synced["rows"], page["changes"])
+            if page["changes"]:
+                synced["seq"] = page["changes"][-1]["seq"]
+            if not page["has_more"]:
+                return synced
+
+    rows, seq, params = {}, None, {"limit": page_size}
+    while True:
+        response = _request("GET", "/appointments/", params=params, headers=headers)
+        response.raise_for_status()
+        if seq is None:
+            # Later pages may already hold newer rows; replaying the changes
+            # after the first page's seq on top of them is harmless
+            seq = int(response.headers.get("X-Change-Seq", 0))
+        rows.update((row["id"], row) for row in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return {"rows": rows, "seq": seq}
+        params = {**params, "cursor": cursor}
+
+
+def appointments_csv(appointments: list[dict]) -> str:
+    """
+    The rows as GET /appointments/export would write them, built from a copy
+    already held instead of downloading the whole table again.
+    """
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in sorted(appointments, key=lambda a: a["id"]):
+        writer.writerow([row[column] or "" for column in EXPORT_COLUMNS])
+    return output.getvalue()
+
+
+def _result_or_error(future):
+    try:
+        return future.result()
+    except Exception as exc:
+        return exc
+
+
+def load_dashboard(
+    token: str,
+    job_id: str | None = None,
+    synced: dict | None = None,
+    page_size: int = 500,
+):
+    """
+    Fetch the appointments, their stats and the summary job status
+    concurrently on the shared client, so a page render waits for the
+    slowest request rather than all of them in turn, over kept-alive
+    connections. Pass the previous ``appointments`` value as ``synced`` to
+    fetch only the changes since. Each value is the result or the exception
+    its request raised, so one failure does not hide the others.
+    """
+    executor = _get_executor()
+    futures = {
+        "appointments": executor.submit(_sync_appointments, token, synced, page_size),
+        "stats": executor.submit(fetch_stats, token),
+        "summary_job": (
+            executor.submit(fetch_summary_job, token, job_id) if job_id else None
+        ),
+    }
+    return {
+        name: None if future is None else _result_or_error(future)
+        for name, future in futures.items()
+    }
@@ -3,15 +3,13 @@ import pandas as pd
 from datetime import datetime
 
 from client import (
-    list_appointments,
+    appointments_csv,
+    load_dashboard,
     create_appointment,
     delete_appointment,
-    export_appointments_csv,
-    count_appointments_today,
     register_user,
     login_user,
     request_summary,
-    fetch_summary_result,
 )
 
 
@@ -67,23 +65,33 @@ if not st.session_state.get("auth_token"):
 auth_token = st.session_state["auth_token"]
 
 
-# Load appointments with caching
-@st.cache_data(ttl=10)
-def load_data(token: str):
-    return list_appointments(token)
+# Appointments, stats and summary status are fetched concurrently. The
+# appointments are kept in the session and only changes since the last
+# render are fetched; the stats are revalidated by ETag.
+dashboard_data = load_dashboard(
+    auth_token,
+    st.session_state.get("summary_job_id"),
+    st.session_state.get("appointments_sync"),
+)
+synced = dashboard_data["appointments"]
+if isinstance(synced, Exception):
+    st.error(f"Could not load appointments: {synced}")
+    st.stop()
+st.session_state["appointments_sync"] = synced
+appointments = list(synced["rows"].values())
 
 
 # -----------------------------
 # Section 1: Metrics
 # -----------------------------
-appointments = load_data(auth_token)
-
-total_count = len(appointments)
-today_count = count_appointments_today(appointments)
-
-col1, col2 = st.columns(2)
-col1.metric("Total Appointments", total_count)
-col2.metric("Today's Appointments", today_count)
+# Counted by the backend, so the tiles do not depend on the table
+stats = dashboard_data["stats"]
+if isinstance(stats, Exception):
+    st.error(f"Could not load stats: {stats}")
+else:
+    col1, col2 = st.columns(2)
+    col1.metric("Total Appointments", stats["total"])
+    col2.metric("Today's Appointments", stats["today"])
 
 
 # -----------------------------
@@ -91,27 +99,23 @@ col2.metric("Today's Appointments", today_count)
 # -----------------------------
 st.subheader("All Appointments")
 
-if total_count == 0:
+if not appointments:
     st.info("No appointments yet.")
 else:
     df = pd.DataFrame(appointments)
     st.dataframe(df, use_container_width=True)
 
-    try:
-        csv_data = export_appointments_csv(auth_token)
-        st.download_button(
-            label="Download CSV",
-            data=csv_data,
-            file_name="appointments.csv",
-            mime="text/csv",
-        )
-    except Exception as exc:
-        st.error(f"CSV export failed: {exc}")
+    # Written from the synced rows: no download of the whole table per render
+    st.download_button(
+        label="Download CSV",
+        data=appointments_csv(appointments),
+        file_name="appointments.csv",
+        mime="text/csv",
+    )
 
 
 # Refresh button
 if st.button("Refresh Data"):
-    load_data.clear()
     st.rerun()
 
 
@@ -131,7 +135,6 @@ with st.form("create_form"):
 if submitted:
     try:
         create_appointment(auth_token, client_name, date_str, time_str, notes)
-        load_data.clear()
         st.success("Appointment created successfully!")
         st.rerun()
     except Exception as e:
@@ -143,14 +146,13 @@ if submitted:
 # -----------------------------
 st.subheader("Delete Appointment")
 
-if total_count > 0:
+if appointments:
     ids = [a["id"] for a in appointments]
     selected = st.selectbox("Select ID to delete", ids)
 
     if st.button("Delete Selected"):
         try:
             delete_appointment(auth_token, int(selected))
-            load_data.clear()
             st.success("Appointment deleted.")
             st.rerun()
         except Exception as e:
@@ -168,18 +170,23 @@ with colA:
     if st.button("Generate AI Summary"):
         try:
             resp = request_summary(auth_token)
+            st.session_state["summary_job_id"] = resp["job_id"]
             st.success(f"Summary job queued! ({resp['count']} appointments)")
         except Exception as e:
             st.error(f"Error: {e}")
 
 with colB:
     if st.button("Fetch Summary Result"):
-        try:
-            result = fetch_summary_result(auth_token)
-            if result["status"] == "pending":
-                st.warning("Summary not ready yet, try again in a few seconds.")
-            else:
-                st.success("Summary Ready:")
-                st.write(result["summary"])
-        except Exception as e:
-            st.error(f"Error: {e}")
+        # The button's rerun fetched the job status with the other data
+        job = dashboard_data["summary_job"]
+        if job is None:
+            st.info("Generate a summary first.")
+        elif isinstance(job, Exception):
+            st.error(f"Error: {job}")
+        elif job["status"] in ("queued", "running"):
+            st.warning(f"Summary {job['status']}, try again in a few seconds.")
+        elif job["status"] == "failed":
+            st.error(f"Summary failed: {job.get('error')}")
+        else:
+            st.success("Summary Ready:")
+            st.write(job["summary"])